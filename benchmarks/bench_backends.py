@@ -0,0 +1,69 @@
+"""
+Render time, peak memory and size of each PDF backend.
+
+Renders the single-diary scenarios of the suite (and 20 diaries of the
+batch scenario) with every backend of utils.backends and reports the median
+wall time, peak traced memory, pages and output size, with the time
+relative to ReportLab.
+
+Run from the project root:  python -m benchmarks.bench_backends
+"""
+import random
+import statistics
+import time
+import tracemalloc
+
+from benchmarks.suite import (
+    GENERATED_AT, batch_diaries, custom_subject_diaries, empty_diaries, max_length_diaries,
+    typical_diaries, urdu_diaries,
+)
+from utils.backends import BACKENDS
+
+
+SCENARIOS = {
+    'empty': empty_diaries,
+    'typical': typical_diaries,
+    'max_length': max_length_diaries,
+    'custom_subjects': custom_subject_diaries,
+    'urdu': urdu_diaries,
+    'batch_20': lambda rng: batch_diaries(rng, count=20),
+}
+
+
+def render_all(backend, diaries):
+    return [backend.render(diary, generated_at=GENERATED_AT) for diary in diaries]
+
+
+def measure(backend, diaries, repeat):
+    render_all(backend, diaries)  # warm up imports, fonts and logos
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdfs = render_all(backend, diaries)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    render_all(backend, diaries)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pages = sum(pdf.count(b'/Type /Page\n') for pdf in pdfs)
+    return statistics.median(times), peak, pages, sum(len(pdf) for pdf in pdfs)
+
+
+def main(repeat=5):
+    print(f"{'scenario':16} {'backend':10} {'ms':>9} {'vs rl':>7} {'peak KB':>9} "
+          f"{'pages':>6} {'size KB':>8}")
+    for name, make_diaries in SCENARIOS.items():
+        diaries = make_diaries(random.Random(0))
+        rows = [(backend,) + measure(BACKENDS[backend], diaries, repeat) for backend in BACKENDS]
+
+        reportlab_seconds = rows[0][1]
+        for backend, seconds, peak, pages, size in rows:
+            print(f"{name:16} {backend:10} {seconds * 1000:9.1f} "
+                  f"{seconds / reportlab_seconds - 1:+7.0%} {peak / 1024:9.0f} "
+                  f"{pages:6} {size / 1024:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark of monthly digest compilation from stored daily diaries.
+
+Stores 10 classes x 22 school days in an in-memory diary store, then
+compiles every class's monthly digest: first from scratch, then again with
+every day section cached, then after one more day has been added. Rendering
+each day separately with render_diary_pdf is shown for comparison.
+
+Run from the project root:  python -m benchmarks.bench_digest
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.bench_tables import SUBJECTS, make_entry
+from utils.digest import DaySectionCache, render_digest_pdf
+from utils.pdf_generator import render_diary_pdf
+from utils.store import DiaryStore
+
+
+def school_days(start, count):
+    day = start
+    while count:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day += timedelta(days=1)
+
+
+def make_store(classes=10, days=22, seed=0):
+    rng = random.Random(seed)
+    store = DiaryStore(':memory:')
+    for day in school_days(date(2025, 7, 1), days):
+        for class_number in range(1, classes + 1):
+            store.save({
+                'date': day,
+                'class': str(class_number),
+                'section': '',
+                'teacher': 'Benchmark',
+                'subjects': {subject: make_entry('paragraph', 150, rng) for subject in SUBJECTS},
+                'additional_notes': make_entry('paragraph', 100, rng),
+            })
+    return store
+
+
+def compile_all(store, classes, cache):
+    start = time.perf_counter()
+    pages = 0
+    for class_number in range(1, classes + 1):
+        pdf_bytes = render_digest_pdf(str(class_number), date(2025, 7, 1), date(2025, 7, 31),
+                                      store=store, section_cache=cache, cache_pdf=False)
+        pages += pdf_bytes.count(b'/Type /Page\n')
+    return time.perf_counter() - start, pages
+
+
+def main(classes=10, days=22):
+    store = make_store(classes, days)
+    cache = DaySectionCache()
+
+    start = time.perf_counter()
+    for diary_data in store.iter_diaries():
+        render_diary_pdf(diary_data)
+    separate = time.perf_counter() - start
+
+    cold, pages = compile_all(store, classes, cache)
+    warm, _ = compile_all(store, classes, cache)
+
+    # One more school day for every class
+    new_day = list(school_days(date(2025, 7, 1), days + 1))[-1]
+    for class_number in range(1, classes + 1):
+        store.save({'date': new_day, 'class': str(class_number), 'section': '',
+                    'teacher': 'Benchmark', 'subjects': {'english': 'New day'},
+                    'additional_notes': ''})
+    appended, _ = compile_all(store, classes, cache)
+
+    print(f"{classes} classes x {days} days ({pages} digest pages)")
+    print(f"  every day as its own PDF:     {separate:6.2f}s")
+    print(f"  monthly digests, cold:        {cold:6.2f}s")
+    print(f"  monthly digests, days cached: {warm:6.2f}s")
+    print(f"  after appending one day:      {appended:6.2f}s")
+    print(f"  day sections rendered {cache.misses}, reused {cache.hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Size and render time of each PDF output profile.
+
+Renders the typical, Urdu and 10-class combined scenarios of the suite in
+every profile and reports the median render time and the file size, with
+the size relative to the print profile.
+
+Run from the project root:  python -m benchmarks.bench_profiles
+"""
+import random
+import statistics
+import time
+
+from benchmarks.suite import GENERATED_AT, batch_diaries, typical_diaries, urdu_diaries
+from utils.pdf_generator import render_combined_pdf, render_diary_pdf
+from utils.profiles import OUTPUT_PROFILES
+
+
+# name -> (render function, input)
+SCENARIOS = {
+    'typical': (render_diary_pdf, lambda rng: typical_diaries(rng)[0]),
+    'urdu': (render_diary_pdf, lambda rng: urdu_diaries(rng)[0]),
+    'combined_10': (render_combined_pdf, lambda rng: batch_diaries(rng, count=10)),
+}
+
+
+def measure(render, data, profile, repeat):
+    render(data, generated_at=GENERATED_AT, profile=profile)  # warm up logos and fonts
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf_bytes = render(data, generated_at=GENERATED_AT, profile=profile)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(pdf_bytes)
+
+
+def main(repeat=5):
+    print(f"{'scenario':12} {'profile':12} {'ms':>8} {'size KB':>8} {'vs print':>9}")
+    for name, (render, make_input) in SCENARIOS.items():
+        data = make_input(random.Random(0))
+        rows = [(profile,) + measure(render, data, profile, repeat) for profile in OUTPUT_PROFILES]
+
+        print_size = rows[0][2]
+        for profile, seconds, size in rows:
+            print(f"{name:12} {profile:12} {seconds * 1000:8.1f} {size / 1024:8.1f} "
+                  f"{size / print_size - 1:+9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of the text sanitizer against the old clean_text helper on large
+multilingual homework notes.
+
+Run from the project root:  python -m benchmarks.bench_sanitize
+"""
+import timeit
+
+from utils.fonts import get_urdu_font
+from utils.sanitize import sanitize_text
+
+
+def legacy_clean_text(text):
+    """The clean_text helper previously nested in generate_diary_pdf"""
+    if not text:
+        return ""
+    text = str(text)
+    text = text.replace('–', '-')
+    text = text.replace('—', '-')
+    text = text.replace('‘', "'")
+    text = text.replace('’', "'")
+    text = text.replace('“', '"')
+    text = text.replace('”', '"')
+    text = ''.join(char if ord(char) < 128 else '?' for char in text)
+    return text
+
+
+SAMPLES = {
+    'english': "Read chapter 4 – “Our Environment” & solve Q1–Q5 <page 32>.\n",
+    'urdu': "سبق نمبر ۴ یاد کریں اور مشق کے سوالات حل کریں۔\n",
+    'mixed': "Islamiat: سورۃ الفاتحہ یاد کریں — test on Monday’s class.\n",
+}
+
+
+def main(size=200_000, number=20):
+    fonts = ['Helvetica']
+    if get_urdu_font():
+        fonts.append(get_urdu_font())
+
+    print(f"Sanitizing ~{size // 1000} KB per input ({number} runs)")
+    for font_name in fonts:
+        print(f"Font: {font_name}")
+        for name, sample in SAMPLES.items():
+            text = sample * (size // len(sample))
+            sanitize_text(text, font_name)  # warm up the translation table
+
+            legacy = timeit.timeit(lambda: legacy_clean_text(text), number=number) / number
+            plain = timeit.timeit(lambda: sanitize_text(text, font_name), number=number) / number
+            markup = timeit.timeit(lambda: sanitize_text(text, font_name, markup=True), number=number) / number
+
+            print(f"  {name:8} legacy {legacy * 1e3:8.2f} ms   "
+                  f"sanitize {plain * 1e3:8.2f} ms   "
+                  f"sanitize+markup {markup * 1e3:8.2f} ms   "
+                  f"({legacy / plain:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Cold start benchmark of the command line interface.
+
+Runs each command in a fresh interpreter a few times and reports the best
+wall time, then the import time of the main modules (each in a fresh
+interpreter, so shared dependencies are counted every time).
+
+Run from the project root:  python -m benchmarks.bench_startup
+"""
+import subprocess
+import sys
+import tempfile
+import time
+
+
+MODULES = ['diary', 'utils.store', 'utils.pdf_generator', 'utils.batch', 'main']
+
+
+def best_time(command, runs=3, env=None):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, env=env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def import_time(module):
+    code = ("import time; start = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - start)")
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as output_dir:
+        commands = {
+            'python (no imports)': [sys.executable, '-c', 'pass'],
+            'import diary': [sys.executable, '-c', 'import diary'],
+            'diary.py --help': [sys.executable, 'diary.py', '--help'],
+            'diary.py history': [sys.executable, 'diary.py', 'history'],
+            'diary.py render': [sys.executable, 'diary.py', 'render', '--class', '5',
+                                '--subject', 'english=Read chapter 3', '-o', output_dir],
+        }
+        print("Cold start (best of 3)")
+        for label, command in commands.items():
+            print(f"  {label:22} {best_time(command) * 1000:8.0f} ms")
+
+    print("\nImport time")
+    for module in MODULES:
+        print(f"  {module:22} {import_time(module) * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Stress test of table layout with very long subject entries.
+
+Renders diaries whose subjects hold up to tens of kilobytes of text (long
+paragraphs, many short lines, unbroken words and Urdu) and reports render
+time, pages and time per page, which should stay roughly constant as the
+entries grow.
+
+Run from the project root:  python -m benchmarks.bench_tables
+"""
+import random
+import time
+from datetime import date
+
+from utils.pdf_generator import render_diary_pdf
+
+
+SUBJECTS = ['english', 'urdu', 'math', 'science', 'islamiat',
+            'nardban', 'masharti_ulom', 'rasool_e_arabi']
+
+WORDS = ("read chapter exercise solve questions page notebook learn poem "
+         "revise test tomorrow bring colours draw diagram write summary").split()
+URDU_WORDS = "سبق یاد کریں مشق سوالات حل صفحہ کتاب ٹیسٹ کل پڑھیں لکھیں".split()
+
+
+def make_entry(kind, size, rng):
+    """Build roughly size characters of one kind of stress text"""
+    if kind == 'paragraph':
+        words = []
+        while sum(len(w) + 1 for w in words) < size:
+            words.append(rng.choice(WORDS))
+        return ' '.join(words)
+    if kind == 'lines':
+        return '\n'.join(f"{i}. {rng.choice(WORDS)}" for i in range(size // 12))
+    if kind == 'unbroken':
+        return 'x' * size
+    if kind == 'urdu':
+        words = []
+        while sum(len(w) + 1 for w in words) < size:
+            words.append(rng.choice(URDU_WORDS))
+        return ' '.join(words)
+    raise ValueError(kind)
+
+
+def make_diary(kind, size, seed=0):
+    rng = random.Random(seed)
+    return {
+        'date': date(2025, 7, 4),
+        'class': '5',
+        'section': 'A',
+        'teacher': 'Stress Test',
+        'subjects': {subject: make_entry(kind, size, rng) for subject in SUBJECTS},
+        'additional_notes': make_entry(kind, size, rng),
+    }
+
+
+def main(sizes=(1_000, 5_000, 20_000, 50_000),
+         kinds=('paragraph', 'lines', 'unbroken', 'urdu')):
+    print(f"{'kind':10} {'chars/subject':>14} {'seconds':>9} {'pages':>6} {'ms/page':>8}")
+    for kind in kinds:
+        for size in sizes:
+            diary = make_diary(kind, size)
+            start = time.perf_counter()
+            pdf_bytes = render_diary_pdf(diary)
+            elapsed = time.perf_counter() - start
+            pages = pdf_bytes.count(b'/Type /Page\n')
+            print(f"{kind:10} {size:14,} {elapsed:9.2f} {pages:6} "
+                  f"{elapsed / pages * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
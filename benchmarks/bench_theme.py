@@ -0,0 +1,31 @@
+"""
+Micro-benchmark of the per-render style setup cost.
+
+"Before" rebuilds the stylesheet, paragraph styles, table styles and the
+timezone on every render (what generate_diary_pdf used to do) from an
+already parsed template, so file reading and JSON parsing are not counted;
+"after" uses the shared theme from get_theme().
+
+Run from the project root:  python -m benchmarks.bench_theme
+"""
+import timeit
+
+from utils.theme import DEFAULT_TEMPLATE_PATH, DiaryTheme, get_theme, read_template, template_digest
+
+
+def main(number=2000):
+    get_theme()  # first use builds the shared theme
+
+    template = read_template(DEFAULT_TEMPLATE_PATH)
+    digest = template_digest(template)
+    before = timeit.timeit(lambda: DiaryTheme(template, digest), number=number) / number
+    after = timeit.timeit(get_theme, number=number) / number
+
+    print(f"Per-render style setup ({number} runs)")
+    print(f"  before (rebuilt per render): {before * 1e6:10.1f} us")
+    print(f"  after  (shared theme):       {after * 1e6:10.1f} us")
+    print(f"  speedup:                     {before / after:10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Rendering benchmark suite and regression check for the PDF generator.
+
+Renders synthetic diaries for a fixed set of scenarios and reports, per
+scenario, the median wall time, the time spent drawing headers/footers,
+peak traced memory, pages produced and output size. Results can be saved as
+JSON and compared against a stored baseline; any scenario slower (or using
+more memory) than the baseline by more than the threshold is reported as a
+regression and the exit status is 1.
+
+Run from the project root:
+    python -m benchmarks.suite                              # print results
+    python -m benchmarks.suite -o benchmarks/baseline.json  # store a baseline
+    python -m benchmarks.suite -b benchmarks/baseline.json  # compare against it
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import reportlab
+
+from benchmarks.bench_tables import SUBJECTS, make_entry
+from utils import pdf_generator
+from utils.pdf_generator import render_diary_pdf
+
+
+# Fixed footer time so output sizes are comparable between runs
+GENERATED_AT = datetime(2025, 7, 4, 14, 30)
+
+CUSTOM_SUBJECTS = ['computer', 'drawing', 'nazra', 'general_knowledge']
+
+
+def make_diary(subjects, notes='', class_name='5', section='A'):
+    return {
+        'date': date(2025, 7, 4),
+        'class': class_name,
+        'section': section,
+        'teacher': 'Benchmark',
+        'subjects': subjects,
+        'additional_notes': notes,
+    }
+
+
+def empty_diaries(rng):
+    return [make_diary({subject: '' for subject in SUBJECTS})]
+
+
+def typical_diaries(rng):
+    return [make_diary(
+        {subject: make_entry('paragraph', 150, rng) for subject in SUBJECTS},
+        make_entry('paragraph', 200, rng),
+    )]
+
+
+def max_length_diaries(rng):
+    return [make_diary(
+        {subject: make_entry('paragraph', 5_000, rng) for subject in SUBJECTS},
+        make_entry('lines', 5_000, rng),
+    )]
+
+
+def custom_subject_diaries(rng):
+    subjects = {subject: make_entry('paragraph', 150, rng)
+                for subject in SUBJECTS + CUSTOM_SUBJECTS}
+    return [make_diary(subjects, make_entry('paragraph', 200, rng))]
+
+
+def urdu_diaries(rng):
+    return [make_diary(
+        {subject: make_entry('urdu', 300, rng) for subject in SUBJECTS},
+        make_entry('urdu', 300, rng),
+    )]
+
+
+def batch_diaries(rng, count=100):
+    return [
+        make_diary(
+            {subject: make_entry('paragraph', 150, rng) for subject in SUBJECTS},
+            make_entry('paragraph', 200, rng),
+            class_name=str(i // 10 + 1),
+            section='ABCDEFGHIJ'[i % 10],
+        )
+        for i in range(count)
+    ]
+
+
+SCENARIOS = {
+    'empty': empty_diaries,
+    'typical': typical_diaries,
+    'max_length': max_length_diaries,
+    'custom_subjects': custom_subject_diaries,
+    'urdu': urdu_diaries,
+    'batch_100': batch_diaries,
+}
+
+
+class HeaderFooterTimer:
+    """
+    Temporarily wraps create_header_footer to add up the time spent in it
+    """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+
+    def __enter__(self):
+        original = self._original = pdf_generator.create_header_footer
+
+        def timed(canvas, doc):
+            start = time.perf_counter()
+            try:
+                return original(canvas, doc)
+            finally:
+                self.seconds += time.perf_counter() - start
+                self.calls += 1
+
+        pdf_generator.create_header_footer = timed
+        return self
+
+    def __exit__(self, *exc):
+        pdf_generator.create_header_footer = self._original
+
+
+def render_all(diaries):
+    return [render_diary_pdf(diary, generated_at=GENERATED_AT) for diary in diaries]
+
+
+def run_scenario(name, repeat=5, seed=0):
+    diaries = SCENARIOS[name](random.Random(seed))
+    render_all(diaries)  # warm up fonts, logos and caches
+
+    times = []
+    header_times = []
+    for _ in range(repeat):
+        with HeaderFooterTimer() as header:
+            start = time.perf_counter()
+            pdfs = render_all(diaries)
+            times.append(time.perf_counter() - start)
+        header_times.append(header.seconds)
+
+    # Memory is traced in a separate run, tracing slows rendering down
+    tracemalloc.start()
+    render_all(diaries)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'diaries': len(diaries),
+        'seconds': statistics.median(times),
+        'header_footer_seconds': statistics.median(header_times),
+        'peak_memory_bytes': peak,
+        'pages': sum(pdf.count(b'/Type /Page\n') for pdf in pdfs),
+        'size_bytes': sum(len(pdf) for pdf in pdfs),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a message per scenario that got slower or used more memory than
+    the baseline by more than threshold (a fraction)
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        for metric in ('seconds', 'peak_memory_bytes'):
+            if before[metric] and result[metric] > before[metric] * (1 + threshold):
+                change = result[metric] / before[metric] - 1
+                regressions.append(
+                    f"{name}: {metric} {before[metric]:.4g} -> {result[metric]:.4g} "
+                    f"(+{change:.0%})"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark diary PDF rendering")
+    parser.add_argument('-s', '--scenario', action='append', choices=list(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help="Timed runs per scenario (default: 5)")
+    parser.add_argument('-o', '--output', help="Save results as JSON to this file")
+    parser.add_argument('-b', '--baseline', help="Compare against results saved earlier")
+    parser.add_argument('-t', '--threshold', type=float, default=0.15,
+                        help="Allowed slowdown before failing (default: 0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'scenario':16} {'diaries':>7} {'ms':>9} {'header ms':>10} "
+          f"{'peak KB':>9} {'pages':>6} {'size KB':>8}")
+    for name in args.scenario or SCENARIOS:
+        result = results[name] = run_scenario(name, repeat=args.repeat)
+        print(f"{name:16} {result['diaries']:7} {result['seconds'] * 1000:9.1f} "
+              f"{result['header_footer_seconds'] * 1000:10.1f} "
+              f"{result['peak_memory_bytes'] / 1024:9.0f} {result['pages']:6} "
+              f"{result['size_bytes'] / 1024:8.0f}")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'reportlab': reportlab.Version,
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions against {args.baseline} (threshold {args.threshold:.0%}):")
+            for message in regressions:
+                print(f"  {message}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
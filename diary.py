@@ -0,0 +1,261 @@
+"""
+Command line interface and library entry points of the diary manager,
+usable without Streamlit (e.g. from cron):
+
+    python diary.py render --class 5 --section A --subject english="Read chapter 3"
+    python diary.py render --class 5 --date 2025-07-04     # a saved diary
+    python diary.py render --class 5 --date 2025-07-04 --profile mobile
+    python diary.py render --class 5 --date 2025-07-04 --backend fpdf2
+    python diary.py batch diaries.csv --workers 4          # records from a file
+    python diary.py batch --date 2025-07-04 --combined     # every saved diary of a day
+    python diary.py import homework.xlsx --workers 4          # spreadsheet rows
+    python diary.py history --since 2025-07-01 --class 5
+
+Importing this module is cheap: ReportLab and the renderer are imported
+only when a PDF is actually produced. Add --timings to any command to see
+how long the imports and the command took.
+"""
+import argparse
+import importlib
+import sys
+import time
+from datetime import date
+
+
+# Output profiles of utils.profiles and PDF engines of utils.backends,
+# listed here to keep --help import-free
+PROFILES = ('print', 'screen', 'mobile')
+BACKENDS = ('reportlab', 'fpdf2')
+
+# Seconds spent importing each lazily loaded module
+IMPORT_TIMES = {}
+
+
+def _load(name):
+    """
+    Import a module on first use, recording how long the import took
+    """
+    module = sys.modules.get(name)
+    if module is None:
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+def render_pdf(diary_data, cached=False):
+    """
+    Render a diary to PDF bytes (from the render cache if cached is True)
+    """
+    if cached:
+        return _load('utils.render_cache').render_diary_pdf_cached(diary_data)
+    return _load('utils.backends').get_backend(diary_data.get('backend')).render(diary_data)
+
+
+def generate_pdf(diary_data, output_dir='output', profile=None, backend=None):
+    """
+    Render a diary and save it in output_dir, returning the file path;
+    profile is 'print', 'screen' or 'mobile' and backend 'reportlab' or 'fpdf2'
+    """
+    return _load('utils.pdf_generator').generate_diary_pdf(diary_data, output_dir, profile, backend)
+
+
+def generate_batch(records, output_dir='output', max_workers=None, combined=False, profile=None,
+                   backend=None):
+    """
+    Render many diaries in parallel, or into one combined PDF; returns the
+    batch results, or the path of the combined PDF (always drawn with
+    ReportLab)
+    """
+    if profile:
+        records = [dict(diary_data, profile=profile) for diary_data in records]
+    if backend:
+        records = [dict(diary_data, backend=backend) for diary_data in records]
+    if combined:
+        return _load('utils.pdf_generator').generate_combined_pdf(records, output_dir)
+    return _load('utils.batch').generate_batch(records, output_dir, max_workers)
+
+
+def import_spreadsheet(path, output_dir='output', render=True, max_workers=None, progress=None):
+    """
+    Stream the diaries of a CSV or XLSX file into the saved diaries and,
+    if render is True, generate their PDFs; returns the import summary
+    """
+    with open(path, 'rb') as f:
+        return _load('utils.importer').import_diaries(
+            f, path, output_dir, render=render, max_workers=max_workers, progress=progress
+        )
+
+
+def load_records(path):
+    """
+    Load diary_data records from a JSON or CSV file
+    """
+    return _load('utils.helpers').load_diary_records(path)
+
+
+def saved_diaries(start=None, end=None, class_name=None, section=None):
+    """
+    Yield saved diary_data records, optionally limited to a date range,
+    class and section
+    """
+    store = _load('utils.store').get_diary_store()
+    return store.iter_diaries(start, end, class_name, section)
+
+
+def list_history(start=None, end=None, class_name=None, section=None):
+    """
+    List saved diaries (date, class, section, teacher, updated_at)
+    """
+    store = _load('utils.store').get_diary_store()
+    return store.list(start, end, class_name, section)
+
+
+def _parse_subject(value):
+    key, sep, text = value.partition('=')
+    if not sep or not key.strip():
+        raise argparse.ArgumentTypeError(f"expected SUBJECT=TEXT, got {value!r}")
+    return key.strip().lower(), text
+
+
+def cmd_render(args):
+    if args.subject or args.notes:
+        diary_data = {
+            'date': args.date,
+            'class': args.class_name,
+            'teacher': args.teacher or '',
+            'section': args.section or '',
+            'subjects': dict(args.subject or []),
+            'additional_notes': args.notes or '',
+        }
+    else:
+        diary_data = _load('utils.store').get_diary_store().load(
+            args.date, args.class_name, args.section or ''
+        )
+        if diary_data is None:
+            print(f"No saved diary for class {args.class_name} on {args.date}")
+            return 1
+
+    print(generate_pdf(diary_data, args.output_dir, args.profile, args.backend))
+    return 0
+
+
+def cmd_batch(args):
+    if args.records:
+        records = load_records(args.records)
+    else:
+        records = list(saved_diaries(args.date, args.date))
+    if not records:
+        print("No diaries to generate")
+        return 1
+
+    if args.combined:
+        print(generate_batch(records, args.output_dir, combined=True, profile=args.profile))
+        return 0
+
+    failures = 0
+    for result in generate_batch(records, args.output_dir, args.workers, profile=args.profile,
+                                 backend=args.backend):
+        if result['error']:
+            failures += 1
+            print(f"FAILED  class {result['class']} {result['section']}: {result['error']}")
+        else:
+            print(result['path'])
+    return 1 if failures else 0
+
+
+def cmd_import(args):
+    summary = import_spreadsheet(args.spreadsheet, args.output_dir, not args.no_render, args.workers)
+    for error in summary['errors']:
+        print(f"FAILED  {error}")
+    print(f"{summary['imported']} diaries imported, {summary['rendered']} PDFs generated, "
+          f"{summary['failed']} failed")
+    return 1 if summary['failed'] else 0
+
+
+def cmd_history(args):
+    entries = list_history(args.since, args.until, args.class_name, args.section)
+    for entry in entries:
+        print(f"{entry['date'].isoformat()}  class {entry['class']:<4} "
+              f"section {entry['section'] or '-':<4} {entry['teacher']:<24} "
+              f"saved {entry['updated_at']}")
+    print(f"{len(entries)} diaries")
+    return 0
+
+
+def _parse_date(value):
+    return _load('utils.helpers').parse_diary_date(value)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='diary', description="School diary PDFs without the web app")
+    parser.add_argument('--timings', action='store_true',
+                        help="Report import and command times on stderr")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    render = commands.add_parser('render', help="Render one diary (given here or saved earlier)")
+    render.add_argument('--class', dest='class_name', required=True)
+    render.add_argument('--section', default='')
+    render.add_argument('--date', type=_parse_date, default=date.today(),
+                        help="Diary date, YYYY-MM-DD (default: today)")
+    render.add_argument('--teacher')
+    render.add_argument('--subject', action='append', type=_parse_subject, metavar='SUBJECT=TEXT',
+                        help="Subject entry (repeatable); without entries the saved diary is used")
+    render.add_argument('--notes', help="Additional notes")
+    render.add_argument('-o', '--output-dir', default='output')
+    render.add_argument('-p', '--profile', choices=PROFILES,
+                        help="Output profile (default: DIARY_PDF_PROFILE or print)")
+    render.add_argument('-b', '--backend', choices=BACKENDS,
+                        help="PDF engine (default: DIARY_PDF_BACKEND or reportlab)")
+    render.set_defaults(func=cmd_render)
+
+    batch = commands.add_parser('batch', help="Render many diaries from a file or the saved diaries of a day")
+    batch.add_argument('records', nargs='?', help="JSON or CSV file with diary records")
+    batch.add_argument('--date', type=_parse_date, default=date.today(),
+                       help="Without a file, render the diaries saved for this date (default: today)")
+    batch.add_argument('-w', '--workers', type=int, default=None)
+    batch.add_argument('-c', '--combined', action='store_true',
+                       help="Write all diaries into one PDF with a table of contents")
+    batch.add_argument('-o', '--output-dir', default='output')
+    batch.add_argument('-p', '--profile', choices=PROFILES,
+                       help="Output profile (default: DIARY_PDF_PROFILE or print)")
+    batch.add_argument('-b', '--backend', choices=BACKENDS,
+                       help="PDF engine for separate PDFs (default: DIARY_PDF_BACKEND or reportlab)")
+    batch.set_defaults(func=cmd_batch)
+
+    spreadsheet = commands.add_parser('import', help="Save (and render) the diaries of a CSV or XLSX file")
+    spreadsheet.add_argument('spreadsheet', help="CSV or XLSX file, one row per diary")
+    spreadsheet.add_argument('--no-render', action='store_true',
+                             help="Only save the diaries, don't generate PDFs")
+    spreadsheet.add_argument('-w', '--workers', type=int, default=None)
+    spreadsheet.add_argument('-o', '--output-dir', default='output')
+    spreadsheet.set_defaults(func=cmd_import)
+
+    history = commands.add_parser('history', help="List saved diaries")
+    history.add_argument('--since', type=_parse_date)
+    history.add_argument('--until', type=_parse_date)
+    history.add_argument('--class', dest='class_name')
+    history.add_argument('--section')
+    history.set_defaults(func=cmd_history)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    start = time.perf_counter()
+    status = args.func(args)
+    elapsed = time.perf_counter() - start
+
+    if args.timings:
+        imports = sum(IMPORT_TIMES.values())
+        print(f"\ncommand {elapsed * 1000:.0f} ms, of which imports {imports * 1000:.0f} ms",
+              file=sys.stderr)
+        for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+            print(f"  import {name:24} {seconds * 1000:7.1f} ms", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
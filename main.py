@@ -1,298 +1,446 @@
 import streamlit as st
+import html
+import json
 import os
-from datetime import datetime
-from utils.pdf_generator import generate_diary_pdf
+import tempfile
+from collections import deque
+from datetime import datetime, timedelta
+from utils.archive import archive_filename, write_day_archive
+from utils.assets import get_logos
+from utils.fonts import get_shaper, get_urdu_font
+from utils.jobs import QueueFull, RenderQueue
+from utils.digest import period_range, render_period_digest
+from utils.helpers import combined_filename, digest_filename, filename_part, validate_diary_data
+from utils.importer import IMPORT_TYPES, import_diaries
+from utils.profiles import OUTPUT_PROFILES
+from utils.pdf_generator import profile_diary_pdf, render_combined_pdf, render_stats_percentiles, save_diary_pdf
+from utils.preview import diary_preview
+from utils.store import get_diary_store
+from utils.theme import get_theme
 
-# Page configuration
-st.set_page_config(
-    page_title="School Diary Manager",
-    page_icon="assets/school_logo_right.png",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
+# Clean and Professional CSS (assets/style.css)
+CSS_PATH = 'assets/style.css'
 
-# Clean and Professional CSS
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    .stApp {
-        font-family: 'Inter', sans-serif;
-        background: #f8f9fa;
-    }
-    
-    .main .block-container {
-        padding-top: 2rem;
-        padding-bottom: 2rem;
-        max-width: 1100px;
-    }
-    
-    /* Professional Header */
-    .professional-header {
-        background: white;
-        padding: 2.5rem 2rem;
-        border-radius: 12px;
-        margin-bottom: 2rem;
-        text-align: center;
-        box-shadow: 0 2px 10px rgba(0, 0, 0, 0.08);
-        border-left: 4px solid #4f46e5;
-    }
-    
-    .professional-header h1 {
-        margin: 0;
-        font-size: 2.2rem;
-        font-weight: 700;
-        color: #1f2937;
-        margin-bottom: 0.5rem;
-    }
-    
-    .professional-header p {
-        margin: 0;
-        font-size: 1rem;
-        color: #6b7280;
-        font-weight: 500;
-    }
-    
-    /* Clean containers */
-    .clean-container {
-        background: white;
-        padding: 2rem;
-        border-radius: 12px;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 2px 10px rgba(0, 0, 0, 0.08);
-        border: 1px solid #e5e7eb;
-        transition: all 0.2s ease;
-    }
-    
-    .clean-container:hover {
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.12);
-        transform: translateY(-2px);
-    }
-    
-    /* Section titles */
-    .section-title {
-        font-size: 1.3rem;
-        font-weight: 600;
-        color: #374151;
-        margin-bottom: 1.5rem;
-        display: flex;
-        align-items: center;
-        gap: 0.5rem;
-        padding-bottom: 0.5rem;
-        border-bottom: 2px solid #f3f4f6;
-    }
-    
-    /* Form controls */
-    .stSelectbox > div > div {
-        border: 1px solid #d1d5db;
-        border-radius: 8px;
-        transition: all 0.2s ease;
-    }
-    
-    .stSelectbox > div > div:hover {
-        border-color: #4f46e5;
-    }
-    
-    .stTextInput > div > div > input,
-    .stTextArea > div > div > textarea {
-        border: 1px solid #d1d5db;
-        border-radius: 8px;
-        padding: 12px;
-        font-size: 14px;
-        transition: all 0.2s ease;
-    }
-    
-    .stTextInput > div > div > input:focus,
-    .stTextArea > div > div > textarea:focus {
-        border-color: #4f46e5;
-        box-shadow: 0 0 0 3px rgba(79, 70, 229, 0.1);
-        outline: none;
-    }
-    
-    .stDateInput > div > div > input {
-        border: 1px solid #d1d5db;
-        border-radius: 8px;
-        padding: 12px;
-        transition: all 0.2s ease;
-    }
-    
-    .stDateInput > div > div > input:focus {
-        border-color: #4f46e5;
-        box-shadow: 0 0 0 3px rgba(79, 70, 229, 0.1);
-    }
-    
-    /* Subject areas */
-    .subject-area {
-        background: #f9fafb;
-        border: 1px solid #e5e7eb;
-        border-radius: 8px;
-        padding: 1rem;
-        margin-bottom: 1rem;
-        transition: all 0.2s ease;
-    }
-    
-    .subject-area:hover {
-        border-color: #4f46e5;
-        background: #f8faff;
-    }
-    
-    /* Professional buttons */
-    .stButton > button {
-        background: #4f46e5;
-        color: white;
-        border: none;
-        padding: 14px 28px;
-        border-radius: 8px;
-        font-weight: 600;
-        font-size: 1rem;
-        width: 100%;
-        transition: all 0.2s ease;
-        box-shadow: 0 4px 12px rgba(79, 70, 229, 0.3);
-    }
-    
-    .stButton > button:hover {
-        background: #4338ca;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 16px rgba(79, 70, 229, 0.4);
-    }
-    
-    .stButton > button:active {
-        transform: translateY(0);
-    }
-    
-    /* Download button */
-    .stDownloadButton > button {
-        background: #059669;
-        color: white;
-        border: none;
-        padding: 14px 28px;
-        border-radius: 8px;
-        font-weight: 600;
-        font-size: 1rem;
-        width: 100%;
-        transition: all 0.2s ease;
-        box-shadow: 0 4px 12px rgba(5, 150, 105, 0.3);
-    }
-    
-    .stDownloadButton > button:hover {
-        background: #047857;
-        transform: translateY(-2px);
-        box-shadow: 0 6px 16px rgba(5, 150, 105, 0.4);
-    }
-    
-    /* Alert messages */
-    .alert-success {
-        background: #f0fdf4;
-        border: 1px solid #bbf7d0;
-        border-left: 4px solid #16a34a;
-        color: #15803d;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-    }
-    
-    .alert-error {
-        background: #fef2f2;
-        border: 1px solid #fecaca;
-        border-left: 4px solid #dc2626;
-        color: #dc2626;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-    }
-    
-    .alert-warning {
-        background: #fffbeb;
-        border: 1px solid #fed7aa;
-        border-left: 4px solid #f59e0b;
-        color: #d97706;
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-    }
-    
-    /* Footer */
-    .professional-footer {
-        background: white;
-        padding: 2rem;
-        border-radius: 12px;
-        text-align: center;
-        color: #6b7280;
-        margin-top: 2rem;
-        border-top: 1px solid #e5e7eb;
-    }
-    
-    /* Responsive design */
-    @media (max-width: 768px) {
-        .professional-header h1 {
-            font-size: 1.8rem;
-        }
-        
-        .clean-container {
-            padding: 1.5rem;
-        }
-        
-        .section-title {
-            font-size: 1.1rem;
-        }
-        
-        .stButton > button,
-        .stDownloadButton > button {
-            padding: 12px 24px;
-            font-size: 0.9rem;
-        }
-    }
-    
-    /* Subtle animations */
-    .fade-in {
-        animation: fadeIn 0.5s ease-in;
-    }
-    
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-    
-    /* Form labels */
-    .stTextInput > label,
-    .stTextArea > label,
-    .stSelectbox > label,
-    .stDateInput > label {
-        font-weight: 500;
-        color: #374151;
-        margin-bottom: 0.5rem;
+@st.cache_data
+def load_css(path=CSS_PATH):
+    """
+    Read the app stylesheet once per server process
+    """
+    with open(path, encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
+
+@st.cache_data(ttl=60)
+def logo_exists():
+    """
+    Whether the school logo is in place (checked at most once a minute)
+    """
+    return os.path.exists('assets/school_logo.png')
+
+@st.cache_resource
+def warm_pdf_renderer():
+    """
+    Build the shared styles, register fonts and load the logos once per
+    server process, so the first Generate press doesn't pay for them
+    """
+    get_theme()
+    get_urdu_font()
+    get_shaper()
+    get_logos()
+    return True
+
+@st.cache_resource
+def diary_store():
+    return get_diary_store()
+
+@st.cache_resource
+def render_queue():
+    """
+    Background PDF renders shared by every session, so a slow build never
+    blocks the script thread and a burst of submissions is queued
+    """
+    return RenderQueue()
+
+@st.cache_resource
+def render_stats_log():
+    """
+    Records of the renders profiled from the diagnostics panel (the last
+    1000, shared by every session)
+    """
+    return deque(maxlen=1000)
+
+def configure_page():
+    """
+    Page configuration and styling; must run before any other Streamlit call
+    """
+    st.set_page_config(
+        page_title="School Diary Manager",
+        page_icon="assets/school_logo_right.png",
+        layout="wide",
+        initial_sidebar_state="collapsed"
+    )
+    st.markdown(load_css(), unsafe_allow_html=True)
+
+CLASSES = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
+
+# Standard subjects (display label -> subject key)
+SUBJECTS = {
+    "📝 English": "english",
+    "📜 Urdu": "urdu",
+    "📐 Mathematics": "math",
+    "🔬 Science": "science",
+    "🕌 Islamiat": "islamiat",
+    "💻 Nardban": "nardban",
+    "📖 Masharti Ulom": "masharti_ulom",
+    "🕋 Rasool e Arabi": "rasool_e_arabi",
+}
+
+def load_diary_into_form(diary_data):
+    """
+    Fill the form widgets with a stored diary (used as a button callback,
+    before the widgets are created)
+    """
+    state = st.session_state
+    state['diary_date'] = diary_data['date']
+    if diary_data['class'] in CLASSES:
+        state['selected_class'] = diary_data['class']
+    state['teacher_name'] = diary_data.get('teacher', '')
+    state['section'] = diary_data.get('section', '')
+    state['additional_notes'] = diary_data.get('additional_notes', '')
+    
+    standard_keys = set(SUBJECTS.values())
+    custom_keys = [key for key in diary_data['subjects'] if key not in standard_keys]
+    state['custom_subject1'] = custom_keys[0].title() if len(custom_keys) > 0 else ''
+    state['custom_subject2'] = custom_keys[1].title() if len(custom_keys) > 1 else ''
+    
+    for key in standard_keys | set(custom_keys):
+        state[f"subject_{key}"] = diary_data['subjects'].get(key, '')
+
+def queue_combined_render(diary_date):
+    """
+    Queue one PDF holding every saved class diary of diary_date (button
+    callback); render_job_status() shows the result
+    """
+    diaries = list(diary_store().iter_diaries(start=diary_date, end=diary_date))
+    try:
+        job_id = render_queue().submit(diaries, render=render_combined_pdf)
+    except QueueFull as e:
+        st.toast(str(e), icon="⏳")
+        return
+    st.session_state['render_job'] = {
+        'id': job_id,
+        'diary_data': None,
+        'save_copy': False,
+        'filename': combined_filename(diaries),
     }
-    
-    /* Expander styling */
-    .streamlit-expanderHeader {
-        background: #f9fafb;
-        border: 1px solid #e5e7eb;
-        border-radius: 8px;
-        padding: 12px 16px;
-        font-weight: 500;
+
+def saved_diary_pdf(diary_data):
+    """
+    PDF of a saved diary, built on the render queue only when its download
+    button is pressed
+    """
+    queue = render_queue()
+    return queue.result(queue.submit(diary_data, timeout=60))
+
+def day_archive(diary_date):
+    """
+    ZIP of every diary PDF of diary_date, built only when its download
+    button is pressed: saved PDFs are reused, missing ones rendered, and the
+    archive is streamed into a temporary file for Streamlit to serve
+    """
+    archive = tempfile.TemporaryFile()
+    # Missing PDFs take the render queue's workers and slots like any render
+    queue = render_queue()
+    write_day_archive(diary_date, archive, max_workers=queue.max_workers, submit=queue.call)
+    archive.seek(0)
+    return archive
+
+def queue_digest_render(entry, period):
+    """
+    Queue the weekly or monthly homework digest of the entry's class and
+    section (button callback); render_job_status() shows the result
+    """
+    request = {'class': entry['class'], 'section': entry['section'], 'period': period, 'date': entry['date']}
+    try:
+        job_id = render_queue().submit(request, render=render_period_digest)
+    except QueueFull as e:
+        st.toast(str(e), icon="⏳")
+        return
+    start, end = period_range(period, entry['date'])
+    st.session_state['render_job'] = {
+        'id': job_id,
+        'diary_data': None,
+        'save_copy': False,
+        'filename': digest_filename(entry['class'], entry['section'], start, end),
     }
+
+def diary_history():
+    """
+    Show saved diaries so they can be reopened in the form or re-rendered
+    """
+    store = diary_store()
+    
+    with st.expander("🗂️ Diary History"):
+        col1, col2 = st.columns(2)
+        with col1:
+            history_from = st.date_input(
+                "Show diaries since",
+                value=datetime.now().date() - timedelta(days=7),
+                key="history_from"
+            )
+        with col2:
+            history_class = st.selectbox("Class", ["All"] + CLASSES, key="history_class")
+        
+        diaries = store.list(
+            start=history_from,
+            class_name=None if history_class == "All" else history_class
+        )
+        if not diaries:
+            st.info("No saved diaries for this selection.")
+            return
+        
+        def label(entry):
+            text = f"{entry['date'].strftime('%a %d %b %Y')} • Class {entry['class']}"
+            if entry['section']:
+                text += f" - Section {entry['section']}"
+            if entry['teacher']:
+                text += f" • {entry['teacher']}"
+            return text
+        
+        entry = st.selectbox("Saved diary", diaries[::-1], format_func=label, key="history_entry")
+        diary_data = store.load(entry['date'], entry['class'], entry['section'])
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button(
+                "✏️ Open in Form",
+                on_click=load_diary_into_form,
+                args=(diary_data,),
+                use_container_width=True
+            )
+        with col2:
+            st.download_button(
+                label="📥 Download PDF",
+                data=lambda: saved_diary_pdf(diary_data),
+                file_name=f"diary_class_{filename_part(diary_data['class'])}_{diary_data['date'].strftime('%Y_%m_%d')}.pdf",
+                mime="application/pdf",
+                use_container_width=True
+            )
+        with col3:
+            st.button(
+                "📚 All Classes of the Day",
+                on_click=queue_combined_render,
+                args=(entry['date'],),
+                help="One PDF with every class diary saved for this date",
+                use_container_width=True
+            )
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.button(
+                "🗓️ Weekly Digest",
+                on_click=queue_digest_render,
+                args=(entry, 'week'),
+                help="All diaries of this class in the week of this date",
+                use_container_width=True
+            )
+        with col2:
+            st.button(
+                "📅 Monthly Digest",
+                on_click=queue_digest_render,
+                args=(entry, 'month'),
+                help="All diaries of this class in the month of this date",
+                use_container_width=True
+            )
+        with col3:
+            st.download_button(
+                "📦 Day's PDFs (ZIP)",
+                data=lambda: day_archive(entry['date']),
+                file_name=archive_filename(entry['date']),
+                mime="application/zip",
+                help="Every class diary PDF of this date in one ZIP file",
+                use_container_width=True
+            )
+
+def spreadsheet_import():
+    """
+    Import many diaries at once from a CSV or XLSX file (one row per diary),
+    saving them to the history and optionally generating their PDFs
+    """
+    with st.expander("📥 Import from Spreadsheet"):
+        st.caption(
+            "One row per diary with date (YYYY-MM-DD), class, section, teacher and "
+            "additional_notes columns, and one column per subject (e.g. english, math)."
+        )
+        upload = st.file_uploader("Spreadsheet", type=list(IMPORT_TYPES), key="import_file")
+        generate = st.checkbox("Generate the PDFs into the output folder", value=True, key="import_generate")
+        if not st.button("📥 Import Diaries", disabled=upload is None, use_container_width=True):
+            return
+        
+        status = st.empty()
+        def progress(summary):
+            status.info(f"⏳ {summary['imported']} imported, {summary['rendered']} generated, "
+                        f"{summary['failed']} failed...")
+        
+        upload.seek(0)
+        # Renders take the render queue's workers and slots like any other
+        queue = render_queue()
+        try:
+            summary = import_diaries(upload, upload.name, store=diary_store(),
+                                     render=generate, progress=progress,
+                                     max_workers=queue.max_workers, submit=queue.call)
+        except ValueError as e:
+            status.markdown(f"""
+            <div class="alert-error">
+                <strong>❌ Error:</strong> {html.escape(str(e))}
+            </div>
+            """, unsafe_allow_html=True)
+            return
+        
+        message = f"{summary['imported']} diaries imported"
+        if generate:
+            message += f", {summary['rendered']} PDFs generated"
+        status.markdown(f"""
+        <div class="alert-success">
+            <strong>✅ Done:</strong> {message}.
+        </div>
+        """, unsafe_allow_html=True)
+        if summary['failed']:
+            st.warning(f"{summary['failed']} rows could not be imported:\n\n"
+                       + '\n'.join(f"- {html.escape(error)}" for error in summary['errors']))
+
+def render_job_state(job):
+    """
+    Status of a queued render, or None once the queue has forgotten it
+    """
+    try:
+        return render_queue().status(job['id'])
+    except KeyError:
+        return None
+
+def render_job_status(polling=False):
+    """
+    Show the progress of this session's last render and, once it is done,
+    the download button. polling is True while the fragment reruns on a timer.
+    """
+    job = st.session_state.get('render_job')
+    status = render_job_state(job) if job else None
+    
+    if status is None:
+        st.session_state.pop('render_job', None)
+        return
+    
+    if status in ('queued', 'running'):
+        st.info("⏳ Generating PDF..." if status == 'running' else "⏳ Waiting for a free slot to generate the PDF...")
+        return
+    
+    if polling:
+        # Finished while polling: rerun the whole page to stop the timer
+        st.rerun(scope="app")
+    
+    if status != 'done':
+        st.markdown(f"""
+        <div class="alert-error">
+            <strong>❌ Error:</strong> {html.escape(str(render_queue().error(job['id']) or 'PDF generation was cancelled'))}
+        </div>
+        """, unsafe_allow_html=True)
+        return
+    
+    pdf_data = render_queue().result(job['id'])
+    if job.get('profiled'):
+        pdf_data, record = pdf_data
+        if job.pop('new_stats', False):
+            render_stats_log().append(record)
+            st.session_state['render_stats'] = record
+    if job.pop('save_copy', False):
+        save_diary_pdf(job['diary_data'], pdf_data)
+    
+    # Success message
+    st.markdown("""
+    <div class="alert-success">
+        <strong>✅ Success!</strong> Diary PDF generated successfully!
+    </div>
+    """, unsafe_allow_html=True)
     
-    .streamlit-expanderContent {
-        background: white;
-        border: 1px solid #e5e7eb;
-        border-top: none;
-        border-radius: 0 0 8px 8px;
-        padding: 16px;
-    }
-</style>
-""", unsafe_allow_html=True)
+    # Download button
+    st.download_button(
+        label="📥 Download PDF",
+        data=pdf_data,
+        file_name=job['filename'],
+        mime="application/pdf",
+        use_container_width=True,
+        key="render_job_download"
+    )
+
+def diary_preview_panel(diary_data):
+    """
+    The diary in the form as HTML with its estimated page count, without
+    building the PDF
+    """
+    preview = diary_preview(diary_data)
+    pages = preview.estimated_pages
+    st.markdown('<div class="clean-container">', unsafe_allow_html=True)
+    st.markdown(
+        f'<div class="section-title">👁️ Preview '
+        f'<span class="preview-pages">about {pages} page{"" if pages == 1 else "s"}</span></div>',
+        unsafe_allow_html=True
+    )
+    st.markdown(preview.html, unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_diagnostics():
+    """
+    Debug panel: timing breakdown of the last profiled render and percentiles
+    across all profiled renders of this server
+    """
+    with st.expander("🔧 Render Diagnostics"):
+        st.toggle(
+            "Profile PDF renders",
+            key="profile_renders",
+            help="Time each phase of the next renders (profiled renders skip the PDF cache)"
+        )
+        
+        record = st.session_state.get('render_stats')
+        if record is None:
+            st.caption("Turn on profiling and generate a diary to see where the time goes.")
+            return
+        
+        st.markdown(f"**Last render:** {record['total_seconds'] * 1000:.0f} ms")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.table({'ms': {name: round(seconds * 1000, 1) for name, seconds in record['phases'].items()}})
+        with col2:
+            st.table({'count': record['counters']})
+        
+        records = list(render_stats_log())
+        summary = render_stats_percentiles(records)
+        st.markdown(f"**Across {len(records)} profiled renders (ms)**")
+        st.table({
+            percentile: {name: round(values[percentile] * 1000, 1) for name, values in summary.items()}
+            for percentile in ('p50', 'p90', 'p99')
+        })
+        
+        st.download_button(
+            label="📤 Export Render Stats (JSON lines)",
+            data='\n'.join(json.dumps(record) for record in records),
+            file_name="render_stats.jsonl",
+            mime="application/x-ndjson",
+            key="render_stats_export"
+        )
 
 def main():
+    configure_page()
+    warm_pdf_renderer()
+    
     # Professional Header
-    st.markdown("""
+    st.markdown(f"""
     <div class="professional-header">
-        <h1>🏫 AL-GHAZALI HIGH SCHOOL</h1>
+        <h1>🏫 {html.escape(get_theme().school_name)}</h1>
         <p>Daily Class Diary Management System</p>
     </div>
     """, unsafe_allow_html=True)
     
     # Logo setup notification
-    if not os.path.exists('assets/school_logo.png'):
+    if not logo_exists():
         st.markdown("""
         <div class="alert-warning">
             <strong>📷 Logo Setup:</strong> Place your school logo as <code>school_logo.png</code> in the <code>assets/</code> folder for professional PDFs.
@@ -307,44 +455,9 @@ def main():
         - **Recommended**: 200x200 pixels, PNG format
         """)
     
-    # Create output directory
-    if not os.path.exists('output'):
-        os.makedirs('output')
-    
-    # Basic Information
-    st.markdown('<div class="clean-container">', unsafe_allow_html=True)
-    st.markdown('<div class="section-title">📅 Basic Information</div>', unsafe_allow_html=True)
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        diary_date = st.date_input(
-            "Date",
-            value=datetime.now().date(),
-            help="Select diary date"
-        )
-        
-        classes = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]
-        selected_class = st.selectbox(
-            "Class",
-            classes,
-            help="Select class"
-        )
-    
-    with col2:
-        teacher_name = st.text_input(
-            "Class Teacher",
-            placeholder="Enter teacher name",
-            help="Class teacher's name"
-        )
-        
-        section = st.text_input(
-            "Section",
-            placeholder="e.g., A, B, C",
-            help="Class section (optional)"
-        )
-    
-    st.markdown('</div>', unsafe_allow_html=True)
+    # Saved diaries
+    diary_history()
+    spreadsheet_import()
     
     # Custom Subjects
     st.markdown('<div class="clean-container">', unsafe_allow_html=True)
@@ -359,126 +472,202 @@ def main():
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Subjects
-    st.markdown('<div class="clean-container">', unsafe_allow_html=True)
-    st.markdown('<div class="section-title">📚 Subject Entries</div>', unsafe_allow_html=True)
-    
-    # Define subjects
-    subjects = {
-        "📝 English": "english",
-        "📜 Urdu": "urdu",
-        "📐 Mathematics": "math",
-        "🔬 Science": "science",
-        "🕌 Islamiat": "islamiat",
-        "💻 Nardban": "nardban",
-        "📖 Masharti Ulom": "masharti_ulom",
-        "🕋 Rasool e Arabi": "rasool_e_arabi",
-    }
-    
-    # Add custom subjects
-    if new_subject1:
-        subjects[f"🆕 {new_subject1}"] = new_subject1.lower()
-    if new_subject2:
-        subjects[f"🆕 {new_subject2}"] = new_subject2.lower()
-    
-    diary_entries = {}
-    
-    # Create subject entries in two columns
-    col1, col2 = st.columns(2)
+    # Form defaults (set once so history can fill the widgets)
+    st.session_state.setdefault('diary_date', datetime.now().date())
     
-    subject_items = list(subjects.items())
-    mid_point = len(subject_items) // 2
+    live_preview = st.checkbox(
+        "👁️ Live preview",
+        key="live_preview",
+        help="Show how the diary will look while you write it; a field updates the preview when you leave it"
+    )
     
-    with col1:
-        for subject_display, subject_key in subject_items[:mid_point]:
-            st.markdown(f'<div class="subject-area">', unsafe_allow_html=True)
-            diary_entries[subject_key] = st.text_area(
-                subject_display,
-                placeholder=f"Enter homework/notes for {subject_display}...",
-                height=100,
-                key=f"subject_{subject_key}"
+    # The diary form only reruns the script when it is submitted, so typing
+    # in a subject doesn't rebuild the page. With live preview the fields
+    # are outside a form: Streamlit sends a field when it loses focus, so the
+    # preview (cached per field) is redone once per edited field, not per key
+    with st.container() if live_preview else st.form("diary_form", border=False):
+        # Basic Information
+        st.markdown('<div class="clean-container">', unsafe_allow_html=True)
+        st.markdown('<div class="section-title">📅 Basic Information</div>', unsafe_allow_html=True)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            diary_date = st.date_input(
+                "Date",
+                help="Select diary date",
+                key="diary_date"
             )
-            st.markdown('</div>', unsafe_allow_html=True)
-    
-    with col2:
-        for subject_display, subject_key in subject_items[mid_point:]:
-            st.markdown(f'<div class="subject-area">', unsafe_allow_html=True)
-            diary_entries[subject_key] = st.text_area(
-                subject_display,
-                placeholder=f"Enter homework/notes for {subject_display}...",
-                height=100,
-                key=f"subject_{subject_key}"
+        
+            selected_class = st.selectbox(
+                "Class",
+                CLASSES,
+                help="Select class",
+                key="selected_class"
             )
-            st.markdown('</div>', unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Additional Notes
-    st.markdown('<div class="clean-container">', unsafe_allow_html=True)
-    st.markdown('<div class="section-title">📌 Additional Notes</div>', unsafe_allow_html=True)
-    
-    additional_notes = st.text_area(
-        "General Notes & Announcements",
-        placeholder="Any additional notes, announcements, or important information...",
-        height=80
-    )
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # Generate PDF Button
-    if st.button("📄 Generate PDF", use_container_width=True):
-        # Validation
-        if not any(diary_entries.values()) and not additional_notes:
-            st.markdown("""
+        
+        with col2:
+            teacher_name = st.text_input(
+                "Class Teacher",
+                placeholder="Enter teacher name",
+                help="Class teacher's name",
+                key="teacher_name"
+            )
+        
+            section = st.text_input(
+                "Section",
+                placeholder="e.g., A, B, C",
+                help="Class section (optional)",
+                key="section"
+            )
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Subjects
+        st.markdown('<div class="clean-container">', unsafe_allow_html=True)
+        st.markdown('<div class="section-title">📚 Subject Entries</div>', unsafe_allow_html=True)
+        
+        # Define subjects
+        subjects = dict(SUBJECTS)
+        
+        # Add custom subjects
+        if new_subject1:
+            subjects[f"🆕 {new_subject1}"] = new_subject1.lower()
+        if new_subject2:
+            subjects[f"🆕 {new_subject2}"] = new_subject2.lower()
+        
+        diary_entries = {}
+        
+        # Create subject entries in two columns
+        col1, col2 = st.columns(2)
+        
+        subject_items = list(subjects.items())
+        mid_point = len(subject_items) // 2
+        
+        with col1:
+            for subject_display, subject_key in subject_items[:mid_point]:
+                st.markdown(f'<div class="subject-area">', unsafe_allow_html=True)
+                diary_entries[subject_key] = st.text_area(
+                    subject_display,
+                    placeholder=f"Enter homework/notes for {subject_display}...",
+                    height=100,
+                    key=f"subject_{subject_key}"
+                )
+                st.markdown('</div>', unsafe_allow_html=True)
+        
+        with col2:
+            for subject_display, subject_key in subject_items[mid_point:]:
+                st.markdown(f'<div class="subject-area">', unsafe_allow_html=True)
+                diary_entries[subject_key] = st.text_area(
+                    subject_display,
+                    placeholder=f"Enter homework/notes for {subject_display}...",
+                    height=100,
+                    key=f"subject_{subject_key}"
+                )
+                st.markdown('</div>', unsafe_allow_html=True)
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Additional Notes
+        st.markdown('<div class="clean-container">', unsafe_allow_html=True)
+        st.markdown('<div class="section-title">📌 Additional Notes</div>', unsafe_allow_html=True)
+        
+        additional_notes = st.text_area(
+            "General Notes & Announcements",
+            placeholder="Any additional notes, announcements, or important information...",
+            height=80,
+            key="additional_notes"
+        )
+        
+        pdf_profile = st.selectbox(
+            "PDF Size",
+            list(OUTPUT_PROFILES),
+            format_func=lambda name: f"{name.title()} — {OUTPUT_PROFILES[name].description}",
+            help="Smaller files for sending to parents by phone; Print keeps full-quality logos",
+            key="pdf_profile"
+        )
+        
+        save_copy = st.checkbox(
+            "Also save a copy in the output folder",
+            value=False,
+            help="The PDF is always available from the download button"
+        )
+        
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Generate PDF and Preview Buttons
+        if live_preview:
+            submitted = st.button("📄 Generate PDF", use_container_width=True)
+            show_preview = True
+        else:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                submitted = st.form_submit_button("📄 Generate PDF", use_container_width=True)
+            with col2:
+                show_preview = st.form_submit_button("👁️ Preview", use_container_width=True)
+    
+    # Prepare data
+    diary_data = {
+        'date': diary_date,
+        'class': selected_class,
+        'teacher': teacher_name,
+        'section': section,
+        'subjects': diary_entries,
+        'additional_notes': additional_notes,
+        'profile': pdf_profile
+    }
+    
+    if show_preview:
+        diary_preview_panel(diary_data)
+    
+    if submitted:
+        # Validation (shared with spreadsheet imports)
+        error = validate_diary_data(diary_data)
+        if error:
+            st.markdown(f"""
             <div class="alert-error">
-                <strong>⚠️ Error:</strong> Please enter at least one subject entry or additional note.
+                <strong>⚠️ Error:</strong> {html.escape(error)}
             </div>
             """, unsafe_allow_html=True)
             return
         
-        # Prepare data
-        diary_data = {
-            'date': diary_date,
-            'class': selected_class,
-            'teacher': teacher_name,
-            'section': section,
-            'subjects': diary_entries,
-            'additional_notes': additional_notes
-        }
-        
         try:
-            # Generate PDF
-            with st.spinner("Generating PDF..."):
-                pdf_path = generate_diary_pdf(diary_data)
+            # Keep the diary so it can be reopened later
+            diary_store().save(diary_data)
+            
+            # Render in the background; render_job_status() picks it up
+            profiled = st.session_state.get('profile_renders', False)
+            st.session_state['render_job'] = {
+                'id': render_queue().submit(diary_data, render=profile_diary_pdf if profiled else None),
+                'diary_data': diary_data,
+                'save_copy': save_copy,
+                'profiled': profiled,
+                'new_stats': profiled,
+                'filename': f"diary_class_{filename_part(selected_class)}_{diary_date.strftime('%Y_%m_%d')}.pdf",
+            }
             
-            # Success message
-            st.markdown("""
-            <div class="alert-success">
-                <strong>✅ Success!</strong> Diary PDF generated successfully!
+        except QueueFull as e:
+            st.markdown(f"""
+            <div class="alert-warning">
+                <strong>⏳ Busy:</strong> {html.escape(str(e))}
             </div>
             """, unsafe_allow_html=True)
             
-            # Download button
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_data = pdf_file.read()
-                
-                filename = f"diary_class_{selected_class}_{diary_date.strftime('%Y_%m_%d')}.pdf"
-                
-                st.download_button(
-                    label="📥 Download PDF",
-                    data=pdf_data,
-                    file_name=filename,
-                    mime="application/pdf",
-                    use_container_width=True
-                )
-            
         except Exception as e:
             st.markdown(f"""
             <div class="alert-error">
-                <strong>❌ Error:</strong> {str(e)}
+                <strong>❌ Error:</strong> {html.escape(str(e))}
             </div>
             """, unsafe_allow_html=True)
     
+    # Result of the last Generate press, polled while it is still rendering
+    job = st.session_state.get('render_job')
+    if job is not None:
+        pending = render_job_state(job) in ('queued', 'running')
+        st.fragment(render_job_status, run_every=1 if pending else None)(polling=pending)
+    
+    render_diagnostics()
+    
     # Footer
     st.markdown("""
     <div class="professional-footer">
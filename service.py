@@ -0,0 +1,452 @@
+"""
+HTTP API for other school systems (attendance portal, SMS gateway), served
+next to the Streamlit app by any ASGI server:
+
+    uvicorn service:app --port 8502 --workers 4
+
+    POST /render                diary record (JSON) -> PDF
+    POST /batch                 {"diaries": [records], "combined": false}
+                                -> saved PDFs and their /files URLs (JSON)
+    GET  /files/<path>          a PDF of the output folder (URLs from /batch)
+    GET  /archive/<date>.zip    every diary PDF of a day, streamed
+    GET  /metrics               request latency of the answering worker
+    GET  /health
+
+Records are those of batch files (see utils.helpers): date (YYYY-MM-DD),
+class, section, teacher, additional_notes, optional template (a file in
+templates/), profile and backend, and a "subjects" object or one key per
+subject. Class and section names take letters, digits, spaces, '_' and '-'.
+
+Each worker renders on its own process pool (DIARY_SERVICE_PROCESSES,
+default up to 4), so its event loop keeps answering while diaries build.
+Requests share nothing but the output folder and the render cache on
+disk, so workers can be added until workers x processes fills the CPUs.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from utils.archive import archive_filename, day_archive_members, iter_day_archive
+from utils.backends import get_backend
+from utils.helpers import (
+    DIARY_FIELDS, class_label, diary_data_from_record, diary_filename, parse_diary_date, validate_diary_data,
+)
+from utils.pdf_generator import generate_combined_pdf, generate_diary_pdf
+from utils.profiles import get_output_profile
+from utils.render_cache import render_diary_pdf_cached
+from utils.storage import OUTPUT_DIR, get_output_storage
+from utils.theme import DEFAULT_TEMPLATE_PATH, get_theme
+
+
+logger = logging.getLogger(__name__)
+
+RENDER_PROCESSES = int(os.environ.get('DIARY_SERVICE_PROCESSES') or min(4, os.cpu_count() or 1))
+
+# Largest request body and batch accepted
+MAX_BODY_BYTES = 10 * 1024 * 1024
+MAX_BATCH = 500
+
+# Bytes sent per message when streaming a file
+CHUNK_SIZE = 64 * 1024
+
+# Latencies kept per route for the percentiles of /metrics
+LATENCY_SAMPLES = 1000
+
+# Class and section names accepted from clients
+NAME_PATTERN = re.compile(r'[\w -]{1,40}')
+
+# Record fields that must be strings when given
+STRING_FIELDS = ('date', 'teacher', 'additional_notes', 'template', 'profile', 'backend')
+
+TEMPLATES_DIR = os.path.dirname(DEFAULT_TEMPLATE_PATH)
+TEMPLATE_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+
+class HTTPError(Exception):
+    """
+    Raised by a handler to answer with an error status and message
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Response:
+    """
+    Status, content type and either a body or an async iterator of chunks
+    """
+
+    def __init__(self, body=b'', status=200, content_type='application/json', headers=None,
+                 stream=None):
+        self.body = body
+        self.status = status
+        self.headers = [(b'content-type', content_type.encode())]
+        for name, value in (headers or {}).items():
+            self.headers.append((name.lower().encode(), value.encode()))
+        if stream is None:
+            self.headers.append((b'content-length', str(len(body)).encode()))
+        self.stream = stream
+
+
+def json_response(data, status=200):
+    return Response(json.dumps(data, ensure_ascii=False).encode('utf-8'), status)
+
+
+class LatencyStats:
+    """
+    Request counts and recent latencies per route of one worker
+    """
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.started = time.time()
+        self._samples = samples
+        self._routes = {}
+
+    def record(self, route, seconds, status):
+        stats = self._routes.setdefault(
+            route, {'requests': 0, 'errors': 0, 'latencies': deque(maxlen=self._samples)}
+        )
+        stats['requests'] += 1
+        if status >= 500:
+            stats['errors'] += 1
+        stats['latencies'].append(seconds)
+
+    def summary(self, percentiles=(50, 95, 99)):
+        routes = {}
+        for route, stats in self._routes.items():
+            samples = sorted(stats['latencies'])
+            routes[route] = {
+                'requests': stats['requests'],
+                'errors': stats['errors'],
+                # Nearest-rank percentiles, as in render_stats_percentiles
+                **{
+                    f"p{p}_ms": _ms(samples[round(p / 100 * (len(samples) - 1))])
+                    for p in percentiles
+                },
+                'max_ms': _ms(samples[-1]),
+            }
+        return {
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started),
+            'render_processes': RENDER_PROCESSES,
+            'routes': routes,
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+latency_stats = LatencyStats()
+
+_pool = None
+
+
+def get_pool():
+    """
+    The render process pool of this worker
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDER_PROCESSES)
+    return _pool
+
+
+async def run_in_pool(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), function, *args)
+
+
+async def run_in_thread(function, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+async def read_json(receive):
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise HTTPError(400, "Client disconnected")
+        body = message.get('body', b'')
+        size += len(body)
+        if size > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body over {MAX_BODY_BYTES // (1024 * 1024)} MB")
+        chunks.append(body)
+        more_body = message.get('more_body', False)
+    try:
+        return json.loads(b''.join(chunks))
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON")
+
+
+def _check_name(record, field, required=False):
+    value = record.get(field)
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if value is None or value == '':
+        if required:
+            raise HTTPError(400, f"Missing field: {field}")
+        return
+    if not isinstance(value, str) or not NAME_PATTERN.fullmatch(value.strip()):
+        raise HTTPError(400, f"Invalid {field} {value!r} (letters, digits, spaces, '_' and '-' "
+                             f"only, at most 40)")
+
+
+def template_path(name):
+    """
+    Path of a template named by a record (e.g. "girls_campus" or
+    "templates/girls_campus.json"); only files in templates/ are served
+    """
+    name = name.strip()
+    if name.startswith('templates/'):
+        name = name[len('templates/'):]
+    base, ext = os.path.splitext(name)
+    if ext and ext not in TEMPLATE_EXTENSIONS or not NAME_PATTERN.fullmatch(base):
+        raise HTTPError(400, f"Invalid template {name!r}")
+    for extension in ([ext] if ext else TEMPLATE_EXTENSIONS):
+        path = os.path.join(TEMPLATES_DIR, base + extension)
+        if os.path.isfile(path):
+            return path
+    raise HTTPError(400, f"Unknown template {name!r}")
+
+
+def diary_from_json(record):
+    """
+    Validated diary_data of a JSON record, or HTTPError 400
+    """
+    if not isinstance(record, dict):
+        raise HTTPError(400, "A diary must be a JSON object")
+    # Class and section become file names, so only plain names are accepted
+    _check_name(record, 'class', required=True)
+    _check_name(record, 'section')
+    for field in STRING_FIELDS:
+        if record.get(field) is not None and not isinstance(record[field], str):
+            raise HTTPError(400, f"{field} must be a string")
+    subjects = record.get('subjects')
+    if subjects is None:
+        subjects = {key: value for key, value in record.items() if key not in DIARY_FIELDS}
+    elif not isinstance(subjects, dict):
+        raise HTTPError(400, "subjects must be an object")
+    if not all(value is None or isinstance(value, str) for value in subjects.values()):
+        raise HTTPError(400, "Subject entries must be strings")
+
+    try:
+        diary_data = diary_data_from_record(record)
+    except KeyError as e:
+        raise HTTPError(400, f"Missing field: {e.args[0]}")
+    except ValueError:
+        raise HTTPError(400, f"Invalid date {record.get('date')!r} (expected YYYY-MM-DD)")
+
+    if diary_data.get('template'):
+        diary_data['template'] = template_path(diary_data['template'])
+    error = validate_diary_data(diary_data)
+    if error is None:
+        try:
+            get_theme(diary_data.get('template'))
+            get_output_profile(diary_data.get('profile'))
+            get_backend(diary_data.get('backend'))
+        except ValueError as e:
+            error = str(e)
+    if error:
+        raise HTTPError(400, error)
+    return diary_data
+
+
+def content_disposition(disposition, filename):
+    """
+    Content-Disposition value with an ASCII file name and the UTF-8 one
+    (file names may hold Urdu class or section names)
+    """
+    fallback = filename.encode('ascii', 'replace').decode('ascii').replace('?', '_')
+    return f'{disposition}; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename)}'
+
+
+def file_url(path):
+    relative = os.path.relpath(path, get_output_storage(OUTPUT_DIR).root)
+    return '/files/' + relative.replace(os.sep, '/')
+
+
+def file_stream(path):
+    """
+    Async iterator over the chunks of a file, read off the event loop
+    """
+    async def chunks():
+        with open(path, 'rb') as f:
+            while chunk := await run_in_thread(f.read, CHUNK_SIZE):
+                yield chunk
+    return chunks()
+
+
+async def render(params, receive):
+    diary_data = diary_from_json(await read_json(receive))
+    pdf_bytes = await run_in_pool(render_diary_pdf_cached, diary_data)
+    return Response(pdf_bytes, content_type='application/pdf', headers={
+        'Content-Disposition': content_disposition('inline', diary_filename(diary_data)),
+    })
+
+
+async def batch(params, receive):
+    body = await read_json(receive)
+    records = body.get('diaries') if isinstance(body, dict) else None
+    if not isinstance(records, list) or not records:
+        raise HTTPError(400, 'Expected {"diaries": [...]} with at least one diary')
+    if len(records) > MAX_BATCH:
+        raise HTTPError(413, f"At most {MAX_BATCH} diaries per batch")
+    diaries = [diary_from_json(record) for record in records]
+
+    if body.get('combined'):
+        path = await run_in_pool(generate_combined_pdf, diaries, OUTPUT_DIR)
+        return json_response({'url': file_url(path)})
+
+    async def save(diary_data):
+        result = {
+            'class': diary_data['class'],
+            'section': diary_data['section'],
+            'date': diary_data['date'].isoformat(),
+            'url': None,
+            'error': None,
+        }
+        try:
+            result['url'] = file_url(await run_in_pool(generate_diary_pdf, diary_data, OUTPUT_DIR))
+        except Exception as e:
+            logger.warning("Batch render of %s failed: %s", class_label(diary_data), e)
+            result['error'] = f"{type(e).__name__}: {e}"
+        return result
+
+    # Create the output index once, before the pool processes write to it
+    get_output_storage(OUTPUT_DIR)
+    results = await asyncio.gather(*(save(diary_data) for diary_data in diaries))
+    failed = sum(1 for result in results if result['error'])
+    return json_response({'rendered': len(results) - failed, 'failed': failed, 'results': results})
+
+
+async def fetch_file(params, receive):
+    root = os.path.realpath(get_output_storage(OUTPUT_DIR).root)
+    path = os.path.realpath(os.path.join(root, params['path']))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        raise HTTPError(404, "No such file")
+    return Response(content_type='application/pdf', stream=file_stream(path), headers={
+        'Content-Length': str(os.path.getsize(path)),
+    })
+
+
+async def day_archive(params, receive):
+    try:
+        day = parse_diary_date(params['date'])
+    except ValueError:
+        raise HTTPError(404, "No such date")
+    paths, to_render = await run_in_thread(day_archive_members, day, OUTPUT_DIR)
+    if not paths and not to_render:
+        raise HTTPError(404, f"No diaries for {day.isoformat()}")
+
+    async def chunks():
+        # Missing PDFs are rendered on this worker's pool with the other requests
+        archive = iter_day_archive(day, OUTPUT_DIR, max_workers=RENDER_PROCESSES,
+                                   submit=get_pool().submit)
+        try:
+            while (chunk := await run_in_thread(next, archive, None)) is not None:
+                yield chunk
+        finally:
+            archive.close()
+
+    return Response(content_type='application/zip', stream=chunks(), headers={
+        'Content-Disposition': content_disposition('attachment', archive_filename(day)),
+    })
+
+
+async def metrics(params, receive):
+    return json_response(latency_stats.summary())
+
+
+async def health(params, receive):
+    return json_response({'status': 'ok'})
+
+
+# (method, path pattern, handler); named groups are passed to the handler
+ROUTES = [
+    ('POST', re.compile(r'/render'), render),
+    ('POST', re.compile(r'/batch'), batch),
+    ('GET', re.compile(r'/files/(?P<path>.+\.pdf)'), fetch_file),
+    ('GET', re.compile(r'/archive/(?P<date>[0-9-]+)\.zip'), day_archive),
+    ('GET', re.compile(r'/metrics'), metrics),
+    ('GET', re.compile(r'/health'), health),
+]
+
+
+def route(method, path):
+    """
+    (handler, path parameters) for a request, or HTTPError 404/405
+    """
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            if route_method == method:
+                return handler, match.groupdict()
+            allowed = True
+    if allowed:
+        raise HTTPError(405, f"{method} not allowed")
+    raise HTTPError(404, "Not found")
+
+
+async def send_response(send, response):
+    await send({'type': 'http.response.start', 'status': response.status, 'headers': response.headers})
+    if response.stream is None:
+        await send({'type': 'http.response.body', 'body': response.body})
+        return
+    async for chunk in response.stream:
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            get_pool()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _pool is not None:
+                _pool.shutdown(cancel_futures=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    The ASGI application
+    """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    start = time.perf_counter()
+    name = 'unknown'
+    status = 500
+    try:
+        try:
+            handler, params = route(scope['method'], scope['path'])
+            name = handler.__name__
+            response = await handler(params, receive)
+        except HTTPError as e:
+            response = json_response({'error': e.message}, e.status)
+        except Exception:
+            logger.exception("%s %s failed", scope['method'], scope['path'])
+            response = json_response({'error': "Internal error"}, 500)
+        status = response.status
+        await send_response(send, response)
+    finally:
+        seconds = time.perf_counter() - start
+        latency_stats.record(name, seconds, status)
+        logger.info("%s %s %d %.1f ms", scope['method'], scope['path'], status, seconds * 1000)
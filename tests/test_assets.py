@@ -0,0 +1,77 @@
+"""
+Logo embedding by utils.assets.draw_cached_image, which reuses ReportLab
+internals: every page must draw the same, intact logo image objects.
+
+Run from the project root:  python -m pytest tests
+"""
+import re
+import zlib
+from datetime import date
+
+import pytest
+
+from utils.assets import get_logos
+from utils.pdf_generator import render_diary_pdf
+from utils.theme import get_theme
+
+
+OBJECT = re.compile(rb'\n(\d+) 0 obj\n(.*?)\nendobj', re.S)
+
+
+def pdf_objects(pdf_bytes):
+    return {int(number): body for number, body in OBJECT.findall(pdf_bytes)}
+
+
+def xobject_refs(body):
+    resources = re.search(rb'/XObject <<(.*?)>>', body, re.S)
+    return set(map(int, re.findall(rb' (\d+) 0 R', resources.group(1)))) if resources else set()
+
+
+@pytest.fixture
+def multi_page_pdf():
+    return render_diary_pdf({
+        'date': date(2025, 7, 4),
+        'class': '5',
+        'section': 'A',
+        'teacher': 'Test',
+        'subjects': {'english': "Read the chapter again. " * 400},
+        'additional_notes': '',
+    })
+
+
+def test_pages_share_one_xobject_per_logo(multi_page_pdf):
+    logos = [logo for logo in get_logos(*get_theme().logo_paths) if logo]
+    if not logos:
+        pytest.skip("no logo files in assets/")
+    objects = pdf_objects(multi_page_pdf)
+
+    images = {number for number, body in objects.items() if b'/Subtype /Image' in body}
+    masks = {int(ref) for body in objects.values()
+             for ref in re.findall(rb'/SMask (\d+) 0 R', body)}
+    logo_images = images - masks
+    assert len(logo_images) == len({logo.name for logo in logos})
+
+    pages = [body for body in objects.values() if re.search(rb'/Type /Page\n', body)]
+    assert len(pages) > 1
+    for page in pages:
+        # Each page draws the logos through the same page chrome form
+        reachable = set()
+        todo = xobject_refs(page)
+        while todo:
+            number = todo.pop()
+            reachable.add(number)
+            todo |= xobject_refs(objects[number]) - reachable
+        assert reachable & images == logo_images
+
+
+def test_logo_image_data_is_intact(multi_page_pdf):
+    objects = pdf_objects(multi_page_pdf)
+    for body in objects.values():
+        if b'/Subtype /Image' not in body:
+            continue
+        header, stream = body.split(b'stream\n', 1)
+        length = int(re.search(rb'/Length (\d+)', header).group(1))
+        width = int(re.search(rb'/Width (\d+)', header).group(1))
+        height = int(re.search(rb'/Height (\d+)', header).group(1))
+        components = 3 if b'/DeviceRGB' in header else 1
+        assert len(zlib.decompress(stream[:length])) == width * height * components
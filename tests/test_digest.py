@@ -0,0 +1,55 @@
+"""
+Digests reusing cached day sections across builds.
+
+Run from the project root:  python -m pytest tests
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from utils.digest import DaySectionCache, render_digest_pdf
+from utils.store import DiaryStore
+
+
+# Long enough that every day's subjects table splits across pages
+LONG_ENTRY = "Read the chapter again and answer the questions at the end. " * 40
+
+
+@pytest.fixture
+def store():
+    store = DiaryStore(':memory:')
+    day = date(2025, 7, 1)
+    saved = 0
+    while saved < 10:
+        if day.weekday() < 5:
+            store.save({
+                'date': day,
+                'class': '5',
+                'section': 'A',
+                'teacher': 'Test',
+                'subjects': {'english': LONG_ENTRY, 'math': LONG_ENTRY, 'science': LONG_ENTRY},
+                'additional_notes': LONG_ENTRY,
+            })
+            saved += 1
+        day += timedelta(days=1)
+    return store
+
+
+def page_count(pdf_bytes):
+    return pdf_bytes.count(b'/Type /Page\n')
+
+
+def test_week_then_month_reuses_day_sections(store):
+    cache = DaySectionCache()
+    week = render_digest_pdf('5', date(2025, 7, 7), date(2025, 7, 13), section='A',
+                             store=store, section_cache=cache, cache_pdf=False)
+    month = render_digest_pdf('5', date(2025, 7, 1), date(2025, 7, 31), section='A',
+                              store=store, section_cache=cache, cache_pdf=False)
+    again = render_digest_pdf('5', date(2025, 7, 1), date(2025, 7, 31), section='A',
+                              store=store, section_cache=cache, cache_pdf=False)
+
+    assert cache.misses == 10
+    assert cache.hits == 15
+    fresh = render_digest_pdf('5', date(2025, 7, 1), date(2025, 7, 31), section='A',
+                              store=store, section_cache=DaySectionCache(), cache_pdf=False)
+    assert page_count(week) < page_count(month) == page_count(again) == page_count(fresh)
@@ -0,0 +1,37 @@
+"""
+Spreadsheet import: bad rows are reported and the rest of the file goes on.
+
+Run from the project root:  python -m pytest tests
+"""
+import io
+
+from utils.importer import import_diaries, iter_import_rows
+from utils.store import DiaryStore
+
+
+CSV = (
+    "date,class,section,english\n"
+    "2025-07-04,5,A,Read chapter 3\n"
+    "2025-07-05\n"
+    "2025-07-05,6\n"
+    "2025-07-05,7,B,Write an essay\n"
+    "\n"
+)
+
+
+def test_short_rows_are_row_errors():
+    rows = list(iter_import_rows(io.BytesIO(CSV.encode('utf-8')), 'diaries.csv'))
+
+    assert [number for number, _, _ in rows] == [2, 3, 4, 5]
+    assert [diary_data is not None for _, diary_data, _ in rows] == [True, False, False, True]
+    assert rows[1][2] == "Please select a class."
+
+
+def test_import_goes_on_after_short_rows():
+    store = DiaryStore(':memory:')
+    summary = import_diaries(io.BytesIO(CSV.encode('utf-8')), 'diaries.csv',
+                             store=store, render=False)
+
+    assert summary['imported'] == 2
+    assert summary['failed'] == 2
+    assert sorted(entry['class'] for entry in store.list()) == ['5', '7']
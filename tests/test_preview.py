@@ -0,0 +1,36 @@
+"""
+Page estimate of the HTML preview against the rendered PDF.
+
+Run from the project root:  python -m pytest tests
+"""
+from datetime import date
+
+import pytest
+
+from utils.pdf_generator import render_diary_pdf
+from utils.preview import diary_preview
+
+
+def diary(english, notes=''):
+    return {
+        'date': date(2025, 7, 4),
+        'class': '5',
+        'section': 'A',
+        'teacher': 'Test',
+        'subjects': {'english': english},
+        'additional_notes': notes,
+    }
+
+
+@pytest.mark.parametrize('text', [
+    "Read the chapter again and answer the questions. " * 150,
+    # Unbroken runs the cells break in the middle of the word
+    "https://example.com/" + "a1B2c3D4e5" * 300,
+    " ".join(["ID" + "7" * 120] * 20),
+])
+def test_estimate_matches_pdf_pages(text):
+    data = diary(text, notes=text)
+    pages = render_diary_pdf(data).count(b'/Type /Page\n')
+
+    assert pages > 1
+    assert diary_preview(data).estimated_pages == pages
@@ -0,0 +1,31 @@
+"""
+Very long subject entries (the stress corpus of benchmarks/bench_tables.py)
+must lay out without LayoutError and split across pages.
+
+Run from the project root:  python -m pytest tests
+"""
+import random
+from datetime import date
+
+import pytest
+
+from benchmarks.bench_tables import make_entry
+from utils.pdf_generator import render_diary_pdf
+
+
+@pytest.mark.parametrize('kind', ['paragraph', 'lines', 'unbroken'])
+def test_long_entry_splits_across_pages(kind):
+    entry = make_entry(kind, 30_000, random.Random(0))
+    pdf_bytes = render_diary_pdf({
+        'date': date(2025, 7, 4),
+        'class': '5',
+        'section': 'A',
+        'teacher': 'Stress Test',
+        'subjects': {'english': entry},
+        'additional_notes': '',
+    })
+
+    # The entry is the only cell of any size, so every page after the
+    # first holds part of it
+    assert pdf_bytes.startswith(b'%PDF')
+    assert pdf_bytes.count(b'/Type /Page\n') > 1
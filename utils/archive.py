@@ -0,0 +1,168 @@
+"""
+ZIP archive of every diary of a day, streamed while it is being built.
+
+A diary's PDF is taken from the output folder when it was written after
+the diary was last saved; the others are rendered on a process pool (and
+saved to the output folder like any batch render). Each PDF is copied into
+the archive in small chunks and the archive bytes are handed on as soon as
+they are written, so memory stays flat however many classes there are and
+the first bytes go out before the last diary is rendered.
+
+    python -m utils.archive 2025-07-04 -o diaries_2025_07_04.zip
+    python -m utils.archive 2025-07-04 > diaries.zip
+"""
+import argparse
+import io
+import os
+import stat
+import sys
+import time
+import zipfile
+
+from utils.batch import iter_batch
+from utils.helpers import class_label, diary_filename, parse_diary_date
+from utils.storage import OUTPUT_DIR, get_output_storage
+from utils.store import get_diary_store
+
+
+# Bytes read from a PDF per archive write
+CHUNK_SIZE = 64 * 1024
+
+# Archive member listing the diaries that could not be rendered
+ERRORS_NAME = 'errors.txt'
+
+
+def archive_filename(day):
+    """
+    File name for the ZIP of all diaries of a day
+    """
+    return f"diaries_{parse_diary_date(day).strftime('%Y_%m_%d')}.zip"
+
+
+class _ChunkWriter(io.RawIOBase):
+    """
+    Unseekable file keeping what is written until it is taken (zipfile
+    then writes sizes after each member instead of seeking back)
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _member(name, mtime=None):
+    # zipfile gives streamed members owner-only permissions
+    info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+    info.external_attr = (stat.S_IFREG | 0o644) << 16
+    return info
+
+
+def day_archive_members(day, output_dir=OUTPUT_DIR, store=None):
+    """
+    Split the diaries of a day into PDF paths that can be archived as they
+    are and the saved diaries (date, class, section) that need rendering
+    """
+    day = parse_diary_date(day)
+    store = store or get_diary_store()
+    files = {
+        os.path.basename(entry['path']): entry
+        for entry in get_output_storage(output_dir).list(day, day, kind='diary')
+    }
+
+    to_render = []
+    for entry in store.list(day, day):
+        name = diary_filename(entry)
+        file = files.get(name)
+        if file is None or file['written_at'] < entry['updated_at'] or not os.path.exists(file['path']):
+            files.pop(name, None)
+            to_render.append((entry['date'], entry['class'], entry['section']))
+
+    # PDFs without a saved diary (e.g. batch renders from a file) go in too
+    paths = [file['path'] for file in files.values() if os.path.exists(file['path'])]
+    return sorted(paths), to_render
+
+
+def iter_day_archive(day, output_dir=OUTPUT_DIR, store=None, max_workers=None, submit=None):
+    """
+    Yield the bytes of a ZIP with the PDF of every diary of day, as they
+    are produced. Missing PDFs are rendered through submit when given (a
+    shared pool or render queue, see iter_batch), else on a pool of their own.
+    """
+    store = store or get_diary_store()
+    paths, to_render = day_archive_members(day, output_dir, store)
+    stream = _ChunkWriter()
+    errors = []
+
+    # PDFs are compressed already: deflating them saves about 1% for 10x the time
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_STORED) as archive:
+
+        def add_file(path):
+            member = _member(os.path.basename(path), os.path.getmtime(path))
+            with open(path, 'rb') as src, archive.open(member, 'w') as dest:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dest.write(chunk)
+                    data = stream.take()
+                    if data:
+                        yield data
+
+        for path in paths:
+            yield from add_file(path)
+
+        # Loaded one at a time as the render pool asks for them
+        diaries = (store.load(*key) for key in to_render)
+        for result in iter_batch(diaries, output_dir, max_workers, submit=submit):
+            if result['error']:
+                errors.append(f"{class_label(result)}: {result['error']}")
+            else:
+                yield from add_file(result['path'])
+
+        if errors:
+            archive.writestr(_member(ERRORS_NAME), '\n'.join(errors) + '\n')
+    yield stream.take()
+
+
+def write_day_archive(day, fileobj, output_dir=OUTPUT_DIR, store=None, max_workers=None,
+                      submit=None):
+    """
+    Write the ZIP of a day's diaries to a binary file, returning its size
+    """
+    size = 0
+    for chunk in iter_day_archive(day, output_dir, store, max_workers, submit):
+        fileobj.write(chunk)
+        size += len(chunk)
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ZIP of every diary PDF of a day")
+    parser.add_argument('date', help="Diary date, YYYY-MM-DD")
+    parser.add_argument('-o', '--output', help="ZIP file to write (default: standard output)")
+    parser.add_argument('-d', '--output-dir', default=OUTPUT_DIR,
+                        help="Folder of the generated PDFs (default: output)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Render processes for diaries without a PDF (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    day = parse_diary_date(args.date)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            size = write_day_archive(day, f, args.output_dir, max_workers=args.workers)
+        print(f"{args.output}: {size / 1024:.0f} KB", file=sys.stderr)
+    else:
+        write_day_archive(day, sys.stdout.buffer, args.output_dir, max_workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
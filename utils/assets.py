@@ -0,0 +1,156 @@
+import copy
+import os
+import threading
+import zlib
+from io import BytesIO
+
+from PIL import Image as PILImage
+from reportlab.lib.boxstuff import aspectRatioFix
+from reportlab.lib.utils import _digester
+from reportlab.pdfbase import pdfdoc
+
+
+LEFT_LOGO_PATH = 'assets/school_logo.png'
+RIGHT_LOGO_PATH = 'assets/school_logo_right.png'
+
+# Process-wide cache of encoded logo images:
+# (path, max_pixels, jpeg_quality) -> CachedImage
+_image_cache = {}
+_image_lock = threading.Lock()
+
+
+class CachedImage:
+    """
+    A decoded and PDF-encoded image that can be embedded in any document
+    without touching the file again.
+
+    With max_pixels the image is first downsampled to fit that many pixels
+    on its longer side, and with jpeg_quality its colour is re-encoded as
+    JPEG (transparency stays a lossless soft mask).
+    """
+
+    def __init__(self, path, mtime, max_pixels=None, jpeg_quality=None):
+        self.path = path
+        self.mtime = mtime
+        # The name is what ReportLab uses to share one XObject per document
+        self.name = _digester(f"{path}:{mtime}:{max_pixels}:{jpeg_quality}".encode('utf-8'))
+        if max_pixels is None and jpeg_quality is None:
+            self.xobject = pdfdoc.PDFImageXObject(self.name, path, mask='auto')
+            # drawImage registers the soft mask separately, so keep it aside
+            self.smask = self.xobject.__dict__.pop('_smask', None)
+        else:
+            self.xobject, self.smask = _encode_resampled(self.name, path, max_pixels, jpeg_quality)
+        self.width = self.xobject.width
+        self.height = self.xobject.height
+
+
+def _image_xobject(name, image, jpeg_quality=None):
+    """
+    Image XObject for an RGB or L mode PIL image, Flate or JPEG encoded
+    """
+    xobject = pdfdoc.PDFImageXObject(name)
+    xobject.width, xobject.height = image.size
+    xobject.bitsPerComponent = 8
+    xobject.colorSpace = 'DeviceGray' if image.mode == 'L' else 'DeviceRGB'
+    xobject.mask = None
+    if jpeg_quality:
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=jpeg_quality, optimize=True)
+        xobject.streamContent = buffer.getvalue()
+        xobject._filters = ('DCTDecode',)
+    else:
+        xobject.streamContent = zlib.compress(image.tobytes(), 9)
+        xobject._filters = ('FlateDecode',)
+    return xobject
+
+
+def _encode_resampled(name, path, max_pixels, jpeg_quality):
+    """
+    Downsample and re-encode an image file, returning (xobject, smask)
+    """
+    with PILImage.open(path) as image:
+        image = image.convert('RGBA')
+    if max_pixels and max(image.size) > max_pixels:
+        image.thumbnail((max_pixels, max_pixels), PILImage.LANCZOS)
+
+    alpha = image.getchannel('A')
+    smask = None
+    if alpha.getextrema() != (255, 255):
+        smask = _image_xobject(_digester(f"{name}:alpha".encode('utf-8')), alpha)
+        smask._decode = [0, 1]
+    return _image_xobject(name, image.convert('RGB'), jpeg_quality), smask
+
+
+def get_image(path, max_pixels=None, jpeg_quality=None):
+    """
+    Return the cached image for path (downsampled to max_pixels and JPEG
+    encoded at jpeg_quality if given), loading it again only when the
+    file's mtime changes. Returns None if the file does not exist.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    key = (path, max_pixels, jpeg_quality)
+    image = _image_cache.get(key)
+    if image is not None and image.mtime == mtime:
+        return image
+
+    with _image_lock:
+        image = _image_cache.get(key)
+        if image is None or image.mtime != mtime:
+            image = CachedImage(path, mtime, max_pixels, jpeg_quality)
+            _image_cache[key] = image
+    return image
+
+
+def get_logos(left_path=LEFT_LOGO_PATH, right_path=RIGHT_LOGO_PATH, max_pixels=None, jpeg_quality=None):
+    """
+    Return the (left, right) school logos; the right logo falls back to the
+    left one when it is missing. max_pixels and jpeg_quality select a
+    smaller encoding (see OutputProfile.logo_options).
+    """
+    left = get_image(left_path, max_pixels, jpeg_quality)
+    right = get_image(right_path, max_pixels, jpeg_quality) or left
+    return left, right
+
+
+def draw_cached_image(canvas, image, x, y, width, height):
+    """
+    Draw a cached image like canvas.drawImage(..., preserveAspectRatio=True,
+    mask='auto'), embedding it as a single XObject per document and reusing
+    the already encoded image data instead of re-decoding the file.
+
+    This uses ReportLab internals, so requirements.txt pins the tested
+    ReportLab versions and tests/test_assets.py checks the embedding.
+    """
+    canvas._currentPageHasImages = 1
+    doc = canvas._doc
+    reg_name = doc.getXObjectName(image.name)
+    img_obj = doc.idToObject.get(reg_name)
+    if img_obj is None:
+        # First use in this document: register a copy sharing the encoded stream
+        img_obj = copy.copy(image.xobject)
+        canvas._setXObjects(img_obj)
+        doc.Reference(img_obj, reg_name)
+        doc.addForm(image.name, img_obj)
+        if image.smask is not None:
+            mask_reg_name = doc.getXObjectName(image.smask.name)
+            if doc.idToObject.get(mask_reg_name) is None:
+                smask = copy.copy(image.smask)
+                canvas._setXObjects(smask)
+                img_obj.smask = doc.Reference(smask, mask_reg_name)
+            else:
+                img_obj.smask = pdfdoc.PDFObjectReference(mask_reg_name)
+
+    x, y, width, height, _ = aspectRatioFix(
+        True, 'c', x, y, width, height, img_obj.width, img_obj.height
+    )
+
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.scale(width, height)
+    canvas._code.append(f"/{reg_name} Do")
+    canvas.restoreState()
+    canvas._formsinuse.append(image.name)
@@ -0,0 +1,332 @@
+"""
+PDF engines that can render a diary's layout (see utils.layout).
+
+'reportlab' is the full-featured engine used for printing, combined PDFs
+and digests. 'fpdf2' draws the same pages (header, info table, subject and
+notes tables, footer) with fpdf2, imported only when it is used. Pick one
+per call, per diary (a 'backend' field) or with DIARY_PDF_BACKEND;
+python -m benchmarks.bench_backends compares them.
+"""
+import os
+import threading
+from contextlib import nullcontext
+
+from PIL import Image as PILImage
+
+from utils.fonts import get_urdu_font, get_urdu_font_path, is_rtl, shape_text
+from utils.layout import diary_layout
+from utils.pdf_generator import (
+    current_time, format_generation_time, render_diary_pdf, split_cell_text,
+)
+from utils.profiles import get_output_profile
+from utils.sanitize import sanitize_text
+from utils.theme import get_theme
+
+
+DEFAULT_BACKEND = 'reportlab'
+
+
+class ReportLabBackend:
+    """
+    Platypus tables and paragraphs (render_diary_pdf)
+    """
+
+    name = 'reportlab'
+
+    def render(self, diary_data, generated_at=None, stats=None, profile=None):
+        return render_diary_pdf(diary_data, generated_at, stats, profile)
+
+
+class Fpdf2Backend:
+    """
+    The same diary pages drawn with fpdf2's table API
+    """
+
+    name = 'fpdf2'
+
+    def render(self, diary_data, generated_at=None, stats=None, profile=None):
+        theme = get_theme(diary_data.get('template'))
+        profile = get_output_profile(profile or diary_data.get('profile'))
+        layout = diary_layout(diary_data, theme)
+
+        with _phase(stats, 'build'):
+            pdf = _fpdf_class()(theme, profile, generated_at or current_time(theme))
+            pdf.add_page()
+            _draw_diary(pdf, layout, theme)
+            pdf_bytes = bytes(pdf.output())
+
+        if stats is not None:
+            stats.count('pages', pdf.page)
+            stats.count('bytes', len(pdf_bytes))
+        return pdf_bytes
+
+
+BACKENDS = {
+    'reportlab': ReportLabBackend(),
+    'fpdf2': Fpdf2Backend(),
+}
+
+
+def get_backend(name=None):
+    """
+    Return the named backend, falling back to DIARY_PDF_BACKEND and then
+    to ReportLab
+    """
+    name = name or os.environ.get('DIARY_PDF_BACKEND') or DEFAULT_BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF backend {name!r} (choose from {', '.join(BACKENDS)})")
+
+
+def _phase(stats, name):
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def _rgb(color):
+    return tuple(round(channel * 255) for channel in color.rgb())
+
+
+# Logos resampled for a profile: (path, mtime, max_pixels) -> PIL image
+_logo_cache = {}
+_logo_lock = threading.Lock()
+
+
+def _logo(path, max_pixels):
+    """
+    The logo at path as a PIL image (downsampled to max_pixels), or None
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    key = (path, mtime, max_pixels)
+    image = _logo_cache.get(key)
+    if image is None:
+        with _logo_lock:
+            with PILImage.open(path) as source:
+                image = source.convert('RGBA')
+            if max_pixels and max(image.size) > max_pixels:
+                image.thumbnail((max_pixels, max_pixels), PILImage.LANCZOS)
+            _logo_cache[key] = image
+    return image
+
+
+_fpdf_diary_class = None
+
+
+def _fpdf_class():
+    """
+    FPDF subclass drawing the diary header and footer on every page,
+    created on first use so fpdf2 is only imported when needed
+    """
+    global _fpdf_diary_class
+    if _fpdf_diary_class is not None:
+        return _fpdf_diary_class
+
+    try:
+        from fpdf import FPDF
+    except ImportError:
+        raise ValueError("fpdf2 is required for the fpdf2 backend (pip install fpdf2)")
+
+    class FpdfDiary(FPDF):
+        def __init__(self, theme, profile, generated_at):
+            super().__init__(unit='pt', format='A4')
+            self.theme = theme
+            self.generated_at = format_generation_time(generated_at)
+            # Same encoding as ReportLab's standard fonts, so sanitize_text
+            # leaves the same characters
+            self.core_fonts_encoding = 'windows-1252'
+            self.set_creator('School Diary Manager')
+
+            # ReportLab frames add 6pt of padding inside the page margins
+            margins = theme.margins
+            self.set_margins(margins['left'], margins['top'] + 6, margins['right'])
+            self.set_auto_page_break(True, margins['bottom'] + 6)
+
+            max_pixels = profile.logo_options(theme.logo_size).get('max_pixels')
+            left = _logo(theme.logo_paths[0], max_pixels)
+            right = _logo(theme.logo_paths[1], max_pixels) or left
+            self.logos = (left, right)
+            if profile.jpeg_quality:
+                self.set_image_filter('DCTDecode')
+
+            self.urdu_font = None
+
+        def use_urdu_font(self):
+            """
+            Add the Urdu font to this document the first time it is needed
+            """
+            if self.urdu_font is None and get_urdu_font():
+                self.add_font(get_urdu_font(), fname=get_urdu_font_path())
+                self.urdu_font = get_urdu_font()
+            return self.urdu_font
+
+        def header(self):
+            theme = self.theme
+            palette = theme.colors
+            width = self.w
+            x, y = self.x, self.y
+
+            self.set_fill_color(*_rgb(palette['background']))
+            self.rect(0, 0, width, theme.header_height, style='F')
+            self.set_draw_color(*_rgb(palette['primary']))
+            self.set_line_width(3)
+            self.line(0, theme.header_height, width, theme.header_height)
+
+            size = theme.logo_size
+            left, right = self.logos
+            if left:
+                self.image(left, x=60, y=20, w=size, h=size, keep_aspect_ratio=True)
+            if right:
+                self.image(right, x=width - 60 - size, y=20, w=size, h=size, keep_aspect_ratio=True)
+
+            self.set_text_color(*_rgb(palette['title']))
+            self.set_font('helvetica', 'B', 18)
+            self._centred_text(60, theme.school_name)
+            self.set_text_color(*_rgb(palette['text']))
+            self.set_font('helvetica', 'B', 16)
+            self._centred_text(85, theme.subtitle)
+
+            self.set_xy(x, y)
+
+        def footer(self):
+            theme = self.theme
+            palette = theme.colors
+            width, height = self.w, self.h
+
+            self.set_font('helvetica', '', 9)
+            self.set_text_color(*_rgb(palette['muted']))
+            self._centred_text(height - 50, theme.footer_text)
+            self._centred_text(height - 35, f"Created on {self.generated_at}")
+            page_label = f"Page {self.page_no()}"
+            self.text(width - 60 - self.get_string_width(page_label), height - 35, page_label)
+
+            self.set_draw_color(*_rgb(palette['grid']))
+            self.set_line_width(1)
+            self.line(50, height - 25, width - 50, height - 25)
+
+        def _centred_text(self, baseline, text):
+            text = sanitize_text(text, 'Helvetica')
+            self.text((self.w - self.get_string_width(text)) / 2, baseline, text)
+
+    _fpdf_diary_class = FpdfDiary
+    return FpdfDiary
+
+
+def _cell_text(pdf, text, width, font_size):
+    """
+    (text, font family or None, align) for a table cell: RTL text is shaped
+    for the Urdu font and right-aligned, anything else sanitized
+    """
+    if is_rtl(text) and pdf.use_urdu_font():
+        return shape_text(text, pdf.urdu_font, font_size, width - 24), pdf.urdu_font, 'RIGHT'
+    return sanitize_text(text, 'Helvetica'), None, None
+
+
+def _section_header(pdf, title, theme):
+    """
+    Centred white heading on a primary-colour band, like the ReportLab
+    section header paragraph (14pt, 8pt padding, 12pt before, 6pt after)
+    """
+    padding = 8
+    band_height = 14 + 2 * padding
+    # The band's padding reaches into the space before and after the text
+    pdf.ln(12 - padding)
+    if pdf.y + band_height > pdf.page_break_trigger:
+        pdf.add_page()
+    pdf.set_fill_color(*_rgb(theme.colors['primary']))
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font('helvetica', 'B', 14)
+    pdf.set_x(pdf.l_margin - 2)
+    pdf.cell(pdf.epw + 4, band_height, sanitize_text(title, 'Helvetica'), align='C', fill=True)
+    pdf.ln(band_height - padding + 6)
+
+
+def _draw_diary(pdf, layout, theme):
+    """
+    Draw the info table, subjects and notes of a layout into pdf
+    """
+    from fpdf.fonts import FontFace
+
+    palette = theme.colors
+    text = theme.text
+    text_color = _rgb(palette['text'])
+    white = (255, 255, 255)
+    bold = FontFace(emphasis='BOLD')
+
+    pdf.set_draw_color(*_rgb(palette['grid']))
+    pdf.set_line_width(1)
+    pdf.set_text_color(*text_color)
+
+    # Info table
+    info_widths = theme.info_col_widths
+    pdf.set_font('helvetica', '', 11)
+    with pdf.table(col_widths=info_widths, width=sum(info_widths), first_row_as_headings=False,
+                   line_height=13.2, padding=(8, 12, 8, 12), text_align='LEFT',
+                   cell_fill_color=_rgb(palette['background']), cell_fill_mode='ALL') as table:
+        row = table.row()
+        row.cell('Date:', style=bold)
+        row.cell(layout.date_text)
+        row.cell('Level:', style=bold)
+        row.cell(sanitize_text(layout.class_text, 'Helvetica'))
+        if layout.teacher:
+            teacher, family, align = _cell_text(pdf, layout.teacher, info_widths[1], 11)
+            row = table.row()
+            row.cell('Teacher:', style=bold)
+            row.cell(teacher, align=align, style=FontFace(family=family) if family else None)
+            row.cell('')
+            row.cell('')
+    pdf.ln(25)
+
+    # Subjects, alternating row colours per subject and the header row
+    # repeated on every page
+    _section_header(pdf, text['subjects_heading'], theme)
+    pdf.ln(15)
+
+    subject_widths = theme.subjects_col_widths
+    row_colors = [_rgb(color) for color in theme.row_colors]
+    pdf.set_text_color(*text_color)
+    pdf.set_font('helvetica', '', 10)
+    headings = FontFace(emphasis='BOLD', size_pt=12, color=white, fill_color=_rgb(palette['primary']))
+    # fpdf2 has one line height per table: the taller RTL leading when any
+    # entry is Urdu/Arabic
+    line_height = 16 if any(is_rtl(content) for _, content in layout.subjects) else 13
+    with pdf.table(col_widths=subject_widths, width=sum(subject_widths), line_height=line_height,
+                   padding=(10, 12, 10, 12), text_align='LEFT', v_align='TOP',
+                   headings_style=headings) as table:
+        row = table.row()
+        row.cell(sanitize_text(text['subject_column'], 'Helvetica'), align='CENTER')
+        row.cell(sanitize_text(text['content_column'], 'Helvetica'), align='CENTER')
+
+        for index, (name, content) in enumerate(layout.subjects):
+            fill = row_colors[index % 2]
+            for i, chunk in enumerate(split_cell_text(content)):
+                chunk, family, align = _cell_text(pdf, chunk, subject_widths[1], 10)
+                row = table.row()
+                row.cell(sanitize_text(name, 'Helvetica') if i == 0 else '',
+                         style=FontFace(emphasis='BOLD', fill_color=fill))
+                row.cell(chunk, align=align, style=FontFace(family=family, fill_color=fill))
+        if not layout.subjects:
+            row = table.row()
+            row.cell(sanitize_text(text['no_entries'], 'Helvetica'), style=FontFace(emphasis='BOLD', fill_color=row_colors[0]))
+            row.cell(sanitize_text(text['no_homework'], 'Helvetica'), style=FontFace(fill_color=row_colors[0]))
+    pdf.ln(25)
+
+    # Additional notes
+    if layout.notes:
+        _section_header(pdf, text['notes_heading'], theme)
+        pdf.ln(15)
+
+        notes_widths = theme.notes_col_widths
+        pdf.set_text_color(*text_color)
+        pdf.set_font('helvetica', '', 10)
+        label_style = FontFace(emphasis='BOLD', color=white, fill_color=_rgb(palette['notes']))
+        with pdf.table(col_widths=notes_widths, width=sum(notes_widths), first_row_as_headings=False,
+                       line_height=16 if is_rtl(layout.notes) else 13, padding=(10, 12, 10, 12), text_align='LEFT',
+                       v_align='TOP') as table:
+            for i, chunk in enumerate(split_cell_text(layout.notes)):
+                chunk, family, align = _cell_text(pdf, chunk, notes_widths[1], 10)
+                row = table.row()
+                row.cell(sanitize_text(text['notes_label'], 'Helvetica') if i == 0 else '', align='CENTER', style=label_style)
+                row.cell(chunk, align=align, style=FontFace(family=family) if family else None)
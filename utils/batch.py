@@ -0,0 +1,138 @@
+import argparse
+import os
+import sys
+import time
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+from utils.helpers import class_label, load_diary_records
+from utils.pdf_generator import generate_combined_pdf, generate_diary_pdf
+from utils.storage import get_output_storage
+
+
+def _render_one(index, diary_data, output_dir):
+    """
+    Render a single diary inside a worker process and time it
+    """
+    start = time.perf_counter()
+    result = {
+        'index': index,
+        'class': diary_data['class'],
+        'section': diary_data.get('section', ''),
+        'date': diary_data['date'].isoformat(),
+        'path': None,
+        'error': None,
+    }
+    try:
+        result['path'] = generate_diary_pdf(diary_data, output_dir=output_dir)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def generate_batch(records, output_dir='output', max_workers=None):
+    """
+    Render many diaries in parallel on a process pool.
+
+    Returns one result dict per record (in input order) with the PDF path,
+    render time in seconds and the error message if the render failed.
+    """
+    records = list(records)
+    # Create the output index once, before the workers write to it
+    get_output_storage(output_dir)
+
+    if max_workers == 1 or len(records) <= 1:
+        return [_render_one(i, data, output_dir) for i, data in enumerate(records)]
+
+    results = [None] * len(records)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(_render_one, i, data, output_dir)
+            for i, data in enumerate(records)
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result['index']] = result
+
+    return results
+
+
+def iter_batch(records, output_dir='output', max_workers=None, max_pending=None, submit=None):
+    """
+    Render diaries from any iterable (e.g. rows streamed from a spreadsheet)
+    on a process pool, yielding result dicts as renders finish.
+
+    At most max_pending records (default: twice the workers) are in flight,
+    so the input is consumed as fast as it renders and never held in full.
+    submit, e.g. the submit of a pool the caller already runs, is used
+    instead of starting a pool of max_workers processes.
+    """
+    get_output_storage(output_dir)
+
+    if max_workers == 1 and submit is None:
+        for i, data in enumerate(records):
+            yield _render_one(i, data, output_dir)
+        return
+
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * max_workers
+    with ExitStack() as stack:
+        if submit is None:
+            submit = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers)).submit
+        pending = set()
+        for i, data in enumerate(records):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(submit(_render_one, i, data, output_dir))
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate diary PDFs for many classes/sections in one run"
+    )
+    parser.add_argument('records', help="JSON or CSV file with diary records")
+    parser.add_argument('-o', '--output-dir', default='output',
+                        help="Directory for generated PDFs (default: output)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument('-c', '--combined', action='store_true',
+                        help="Write all diaries into one PDF with a table of contents")
+    args = parser.parse_args(argv)
+
+    records = load_diary_records(args.records)
+
+    if args.combined:
+        start = time.perf_counter()
+        path = generate_combined_pdf(records, output_dir=args.output_dir)
+        print(f"{len(records)} diaries combined in "
+              f"{time.perf_counter() - start:.2f}s -> {path}")
+        return 0
+
+    start = time.perf_counter()
+    results = generate_batch(records, output_dir=args.output_dir,
+                             max_workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    failures = 0
+    for result in results:
+        label = class_label(result)
+        if result['error']:
+            failures += 1
+            print(f"FAILED  {label} ({result['date']}) "
+                  f"in {result['seconds']:.3f}s: {result['error']}")
+        else:
+            print(f"OK      {label} ({result['date']}) "
+                  f"in {result['seconds']:.3f}s -> {result['path']}")
+
+    print(f"\n{len(results) - failures}/{len(results)} diaries generated "
+          f"in {elapsed:.2f}s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import argparse
+import calendar
+import hashlib
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from io import BytesIO
+
+from reportlab.lib.units import inch
+from reportlab.platypus import CondPageBreak, Paragraph, Spacer
+
+from utils.assets import get_logos
+from utils.helpers import digest_filename, parse_diary_date
+from utils.pdf_generator import (
+    TEMPLATE_VERSION, CombinedDiaryDocTemplate, create_diary_doc,
+    create_header_footer, diary_story,
+)
+from utils.profiles import get_output_profile
+from utils.render_cache import get_render_cache, normalize_diary_data
+from utils.sanitize import escape_markup
+from utils.storage import get_output_storage
+from utils.store import get_diary_store
+from utils.theme import get_theme
+
+
+PERIOD_TITLES = {
+    'week': "WEEKLY HOMEWORK DIGEST",
+    'month': "MONTHLY HOMEWORK DIGEST",
+}
+
+
+class DaySectionCache:
+    """
+    Table cells of single days' diaries by content hash, with LRU eviction.
+
+    Cached cells keep their line breaks, so a day is only sanitized, shaped
+    and wrapped the first time it goes into a digest. Digests get copies of
+    the cells in tables of their own (see diary_story), so they can be built
+    side by side.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Return the cells for key, calling build() to make them if needed
+        """
+        with self._lock:
+            cells = self._entries.get(key)
+            if cells is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cells
+
+        cells = build()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = cells
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cells
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_day_section_cache = None
+
+
+def get_day_section_cache():
+    """
+    Return the process-wide cache of day sections
+    """
+    global _day_section_cache
+    if _day_section_cache is None:
+        _day_section_cache = DaySectionCache()
+    return _day_section_cache
+
+
+def day_key(diary_data, theme):
+    """
+    Content hash of one day's diary in a given theme
+    """
+    payload = {'template': theme.digest, 'diary': normalize_diary_data(diary_data)}
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def period_range(period, day):
+    """
+    First and last date of the week (Monday to Sunday) or month holding day
+    """
+    day = parse_diary_date(day)
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'month':
+        last = calendar.monthrange(day.year, day.month)[1]
+        return day.replace(day=1), day.replace(day=last)
+    raise ValueError(f"Unknown digest period: {period}")
+
+
+def render_digest_pdf(class_name, start, end, section=None, title=None,
+                      store=None, section_cache=None, cache_pdf=True, generated_at=None):
+    """
+    Render one PDF with every stored diary of a class between start and end
+    (inclusive), a section per day with its own bookmark, and return the
+    PDF bytes.
+
+    Diaries are streamed from the store one at a time. Days whose content is
+    unchanged reuse their cached table cells, and a digest whose days are all
+    unchanged comes straight from the render cache (cache_pdf).
+    """
+    store = store or get_diary_store()
+    section_cache = section_cache or get_day_section_cache()
+    start, end = parse_diary_date(start), parse_diary_date(end)
+    theme = get_theme()
+
+    label = f"Class {class_name}"
+    if section:
+        label += f" - Section {section}"
+    period = f"{start.strftime('%d %B %Y')} to {end.strftime('%d %B %Y')}"
+
+    story = [
+        Paragraph(escape_markup(title or "HOMEWORK DIGEST"), theme.section_header_style),
+        Spacer(1, 12),
+        Paragraph(escape_markup(f"{label} • {period}"), theme.subtitle_style),
+    ]
+
+    keys = []
+    for diary_data in store.iter_diaries(start, end, class_name, section):
+        key = day_key(diary_data, theme)
+
+        # Building a document splits its tables and marks the flowables it
+        # postpones, so every digest lays out its own; only the cells' text
+        # and line breaks are kept between digests
+        flowables = diary_story(diary_data, theme=theme, cells=section_cache.get(key, dict))
+        flowables[0].diary_bookmark = (f"day-{key[:16]}", diary_data['date'].strftime('%A, %d %B %Y'))
+
+        if keys:
+            # Start a day on a new page rather than just its info table
+            story.append(CondPageBreak(2.5 * inch))
+        story.extend(flowables)
+        story.append(Spacer(1, 25))
+        keys.append(key)
+
+    if not keys:
+        story.append(Paragraph("No diaries were saved for this period.", theme.cell_style))
+
+    pdf_cache = get_render_cache() if cache_pdf else None
+    if pdf_cache is not None:
+        payload = {
+            'template': [TEMPLATE_VERSION, theme.digest],
+            'profile': get_output_profile().name,
+            'assets': [[logo.path, logo.mtime] if logo else None
+                       for logo in get_logos(*theme.logo_paths)],
+            'digest': [title, label, start.isoformat(), end.isoformat()],
+            'days': keys,
+        }
+        cache_key = hashlib.sha256(
+            json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        pdf_bytes = pdf_cache.get(cache_key)
+        if pdf_bytes is not None:
+            return pdf_bytes
+
+    buffer = BytesIO()
+    doc = create_diary_doc(buffer, generated_at, CombinedDiaryDocTemplate, theme)
+    doc.build(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
+    pdf_bytes = buffer.getvalue()
+
+    if pdf_cache is not None:
+        pdf_cache.put(cache_key, pdf_bytes)
+    return pdf_bytes
+
+
+def render_period_digest(request):
+    """
+    Render the weekly or monthly digest described by request, a dict with
+    'class', 'section', 'period' ('week' or 'month') and a 'date' in it.
+    Takes a single argument so it can run on the render queue.
+    """
+    start, end = period_range(request['period'], request['date'])
+    return render_digest_pdf(
+        request['class'], start, end,
+        section=request.get('section'),
+        title=PERIOD_TITLES[request['period']],
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile weekly or monthly homework digests from saved diaries"
+    )
+    parser.add_argument('period', choices=list(PERIOD_TITLES),
+                        help="Digest of the week (Monday to Sunday) or the month")
+    parser.add_argument('date', help="Any date in the period (YYYY-MM-DD)")
+    parser.add_argument('-c', '--class', dest='class_name',
+                        help="Class to compile (default: every class with saved diaries)")
+    parser.add_argument('-s', '--section', help="Section to compile")
+    parser.add_argument('-o', '--output-dir', default='output',
+                        help="Directory for the digest PDFs (default: output)")
+    args = parser.parse_args(argv)
+
+    start, end = period_range(args.period, args.date)
+    store = get_diary_store()
+    targets = sorted(
+        {(entry['class'], entry['section'])
+         for entry in store.list(start, end, args.class_name, args.section)},
+        key=lambda target: (len(target[0]), target),
+    )
+    if not targets:
+        print(f"No diaries saved between {start} and {end}")
+        return 1
+
+    storage = get_output_storage(args.output_dir)
+    begin = time.perf_counter()
+    for class_name, section in targets:
+        pdf_bytes = render_digest_pdf(class_name, start, end, section=section,
+                                      title=PERIOD_TITLES[args.period], store=store)
+        path = storage.save(digest_filename(class_name, section, start, end), pdf_bytes, start,
+                            kind='digest', class_name=class_name, section=section)
+        print(f"OK      {path}")
+
+    cache = get_day_section_cache()
+    print(f"\n{len(targets)} digests compiled in {time.perf_counter() - begin:.2f}s "
+          f"({cache.misses} days rendered, {cache.hits} reused)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from utils.sanitize import get_translation_table, sanitize_text
+
+
+URDU_FONT_NAME = 'DiaryUrdu'
+
+# Searched in order; DIARY_URDU_FONT overrides them all
+URDU_FONT_CANDIDATES = [
+    'assets/fonts/urdu.ttf',
+    'assets/fonts/NotoNaskhArabic-Regular.ttf',
+    '/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',
+]
+
+# Urdu letters missing from some Arabic fonts, with the closest Arabic letter
+LETTER_FALLBACKS = {
+    'ہ': 'ه',  # Heh goal -> heh
+    'ے': 'ى',  # Yeh barree -> alef maksura
+}
+
+# Arabic, Arabic Supplement/Extended-A and the presentation form blocks
+_RTL_CHARS = re.compile('[\u0600-\u06ff\u0750-\u077f\u08a0-\u08ff\ufb50-\ufdff\ufe70-\ufeff]')
+
+_urdu_font = None
+_urdu_font_path = None
+_font_lock = threading.Lock()
+
+# (reshape, get_display) from arabic_reshaper/python-bidi, imported on the
+# first RTL text since most diaries have none; False if they are missing
+_shaper = None
+
+
+def get_shaper():
+    """
+    Return (reshape, get_display), or None without arabic_reshaper/python-bidi
+    """
+    global _shaper
+    if _shaper is None:
+        try:
+            import arabic_reshaper
+            from bidi.algorithm import get_display
+        except ImportError:
+            _shaper = False
+        else:
+            _shaper = (arabic_reshaper.reshape, get_display)
+    return _shaper or None
+
+
+def get_urdu_font():
+    """
+    Register an Urdu/Arabic capable TrueType font once per process and
+    return its name, or None if no such font is available.
+
+    ReportLab embeds TrueType fonts as subsets, so only the glyphs actually
+    used end up in the PDF.
+    """
+    global _urdu_font, _urdu_font_path
+    if _urdu_font is not None:
+        return _urdu_font or None
+
+    with _font_lock:
+        if _urdu_font is None:
+            _urdu_font = False
+            candidates = URDU_FONT_CANDIDATES
+            if os.environ.get('DIARY_URDU_FONT'):
+                candidates = [os.environ['DIARY_URDU_FONT']] + candidates
+            for path in candidates:
+                if not os.path.exists(path):
+                    continue
+                try:
+                    pdfmetrics.registerFont(TTFont(URDU_FONT_NAME, path))
+                except Exception as e:
+                    print(f"Could not load Urdu font {path}: {e}")
+                    continue
+                _urdu_font = URDU_FONT_NAME
+                _urdu_font_path = path
+                break
+    return _urdu_font or None
+
+
+def get_urdu_font_path():
+    """
+    Path of the TrueType file behind get_urdu_font(), or None
+    """
+    return _urdu_font_path if get_urdu_font() else None
+
+
+def is_rtl(text):
+    """
+    True if text contains Arabic-script (Urdu, Arabic) characters
+    """
+    return bool(text) and _RTL_CHARS.search(text) is not None
+
+
+def _reshape(reshape, text, renderable):
+    """
+    Join Arabic-script letters into their contextual forms, falling back to
+    similar letters or the base letter where the font has no glyph
+    """
+    fallbacks = {
+        ord(letter): fallback for letter, fallback in LETTER_FALLBACKS.items()
+        if letter not in renderable
+    }
+    reshaped = reshape(text.translate(fallbacks))
+    return ''.join(
+        char if char in renderable else unicodedata.normalize('NFKC', char)
+        for char in reshaped
+    )
+
+
+def _wrap(words, font_name, font_size, max_width):
+    """
+    Greedily wrap words (in logical order) into lines no wider than max_width
+    """
+    space = pdfmetrics.stringWidth(' ', font_name, font_size)
+    lines = []
+    line = []
+    line_width = 0
+    for word in words:
+        width = pdfmetrics.stringWidth(word, font_name, font_size)
+        if line and line_width + space + width > max_width:
+            lines.append(' '.join(line))
+            line = []
+            line_width = 0
+        line_width += (space if line else 0) + width
+        line.append(word)
+    lines.append(' '.join(line))
+    return lines
+
+
+@lru_cache(maxsize=4096)
+def shape_text(text, font_name, font_size=10, max_width=None):
+    """
+    Shape RTL text for drawing with font_name: letters are joined, lines are
+    wrapped to max_width (points) in logical order and each visual line is
+    then put in display order by the bidi algorithm.
+
+    Results are cached, so repeated phrases are shaped only once. Without
+    arabic_reshaper/python-bidi installed the text is only sanitized.
+    """
+    shaper = get_shaper()
+    if shaper is None:
+        return sanitize_text(text, font_name)
+    reshape, get_display = shaper
+
+    renderable = get_translation_table(font_name).renderable
+    lines = []
+    for line in text.split('\n'):
+        shaped = sanitize_text(_reshape(reshape, line, renderable), font_name)
+        if max_width:
+            wrapped = _wrap(shaped.split(' '), font_name, font_size, max_width)
+        else:
+            wrapped = [shaped]
+        lines.extend(get_display(part) for part in wrapped)
+    return '\n'.join(lines)
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import re
+from datetime import date, datetime
+
+
+# Columns that describe the diary itself; every other column in a CSV file
+# is treated as a subject entry
+DIARY_FIELDS = ('date', 'class', 'section', 'teacher', 'additional_notes', 'template', 'profile',
+                'backend')
+
+
+def parse_diary_date(value):
+    """
+    Convert a date, datetime or 'YYYY-MM-DD' string into a date
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip())
+
+
+def diary_data_from_record(record):
+    """
+    Build a diary_data dict (as used by generate_diary_pdf) from a loose record
+    """
+    subjects = record.get('subjects')
+    if subjects is None:
+        subjects = {
+            key: value for key, value in record.items()
+            if key not in DIARY_FIELDS and key != 'subjects'
+        }
+
+    diary_data = {
+        'date': parse_diary_date(record['date']),
+        'class': str(record['class']).strip(),
+        'teacher': (record.get('teacher') or '').strip(),
+        'section': (record.get('section') or '').strip(),
+        'subjects': {key: value or '' for key, value in subjects.items()},
+        'additional_notes': record.get('additional_notes') or '',
+    }
+    # Optional layout template file (see templates/), output profile and
+    # PDF backend
+    for key in ('template', 'profile', 'backend'):
+        if record.get(key):
+            diary_data[key] = record[key]
+    return diary_data
+
+
+def validate_diary_data(diary_data):
+    """
+    Return the reason a diary can't be generated, or None if it can
+    """
+    if not str(diary_data.get('class') or '').strip():
+        return "Please select a class."
+    if not any(diary_data['subjects'].values()) and not diary_data.get('additional_notes'):
+        return "Please enter at least one subject entry or additional note."
+    return None
+
+
+def load_diary_records(path):
+    """
+    Load diary_data records from a JSON (list of objects) or CSV file
+    """
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == '.json':
+        with open(path, encoding='utf-8') as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = [records]
+    elif ext == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            records = list(csv.DictReader(f))
+    else:
+        raise ValueError(f"Unsupported diary file type: {ext or path}")
+
+    return [diary_data_from_record(record) for record in records]
+
+
+def filename_part(text):
+    """
+    Class or section reduced to letters, digits, '_' and '-' so it can't
+    leave the folder a file name is joined to
+    """
+    return re.sub(r'[^\w-]+', '_', str(text).strip()).strip('_')
+
+
+def diary_filename(diary_data):
+    """
+    File name for a diary PDF, unique per class, section and date
+    """
+    date_str = diary_data['date'].strftime('%Y_%m_%d')
+    class_name = filename_part(diary_data['class'])
+    if diary_data.get('section'):
+        class_name += '_' + filename_part(diary_data['section'])
+    return f"diary_{class_name}_{date_str}.pdf"
+
+
+def class_label(diary_data):
+    """
+    Human readable class and section, e.g. 'Class 5 - Section B'
+    """
+    label = f"Class {diary_data['class']}"
+    if diary_data.get('section'):
+        label += f" - Section {diary_data['section']}"
+    return label
+
+
+def combined_filename(diaries):
+    """
+    File name for a combined PDF of several diaries, named after their dates
+    """
+    dates = sorted({diary_data['date'] for diary_data in diaries})
+    date_str = dates[0].strftime('%Y_%m_%d')
+    if len(dates) > 1:
+        date_str += '_to_' + dates[-1].strftime('%Y_%m_%d')
+    return f"diaries_all_classes_{date_str}.pdf"
+
+
+def digest_filename(class_name, section, start, end):
+    """
+    File name for a class digest covering start to end
+    """
+    name = filename_part(class_name)
+    if section:
+        name += '_' + filename_part(section)
+    return f"digest_{name}_{start.strftime('%Y_%m_%d')}_to_{end.strftime('%Y_%m_%d')}.pdf"
@@ -0,0 +1,166 @@
+"""
+Bulk import of diaries from CSV and XLSX spreadsheets.
+
+A spreadsheet has one row per diary: date, class, section, teacher and
+additional_notes columns (headers are matched case-insensitively, spaces
+count as underscores) and one column per subject. Rows are read, validated
+and rendered one at a time, so a whole term imports in constant memory.
+XLSX files need openpyxl.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime, time
+
+from utils.batch import iter_batch
+from utils.helpers import DIARY_FIELDS, diary_data_from_record, validate_diary_data
+from utils.store import get_diary_store
+
+
+IMPORT_TYPES = ('csv', 'xlsx')
+
+# Row errors kept in an import summary; later ones are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+def _header_key(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _cell_value(value):
+    # Every cell becomes text, as in a CSV file: empty cells are None,
+    # classes like 5 come back as 5 or 5.0 and date cells as datetimes
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, datetime):
+        if value.time() == time():
+            return value.date().isoformat()
+        return value.isoformat(' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _iter_csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield [_header_key(name) for name in header]
+        yield from reader
+    finally:
+        # Leave the caller's file open (unless it was closed under us)
+        if not fileobj.closed:
+            text.detach()
+
+
+def _iter_xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("openpyxl is required to import .xlsx files (pip install openpyxl)")
+
+    # read_only streams rows from the file instead of building the sheet
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield [_header_key(name) for name in header]
+        for row in rows:
+            yield [_cell_value(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(fileobj, filename):
+    """
+    Yield (row_number, diary_data, error) for every non-empty row of a CSV
+    or XLSX file; diary_data is None when the row is invalid and error says
+    why
+    """
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    if ext not in IMPORT_TYPES:
+        raise ValueError(f"Unsupported spreadsheet type: {ext or filename}")
+    rows = _iter_csv_rows(fileobj) if ext == 'csv' else _iter_xlsx_rows(fileobj)
+
+    header = next(rows, None)
+    if header is None:
+        return
+    missing = [name for name in ('date', 'class') if name not in header]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    for number, row in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in row):
+            continue
+        # Short rows (trailing cells left out) count as empty cells
+        row = list(row) + [''] * (len(header) - len(row))
+        record = {
+            key: value for key, value in zip(header, row)
+            if key and (key in DIARY_FIELDS or str(value).strip())
+        }
+        try:
+            diary_data = diary_data_from_record(record)
+            error = validate_diary_data(diary_data)
+        except KeyError as e:
+            yield number, None, f"missing value for {e.args[0]}"
+            continue
+        except ValueError:
+            yield number, None, f"invalid date {record.get('date')!r} (expected YYYY-MM-DD)"
+            continue
+        except (TypeError, AttributeError) as e:
+            # A cell the row can't be read from; the rest of the file goes on
+            yield number, None, f"unreadable row ({type(e).__name__}: {e})"
+            continue
+        yield number, (None if error else diary_data), error
+
+
+def import_diaries(fileobj, filename, output_dir='output', store=None, render=True,
+                   max_workers=None, progress=None, submit=None):
+    """
+    Stream the diaries of a spreadsheet into the diary store and, if render
+    is True, render each one into output_dir as it is read.
+
+    progress, if given, is called with the running summary as rows are
+    imported and rendered. submit runs the renders on a shared pool or
+    render queue (see iter_batch) instead of a pool of their own. Returns the summary: imported, rendered and
+    failed counts and the (first MAX_REPORTED_ERRORS) error messages.
+    """
+    store = store or get_diary_store()
+    summary = {'imported': 0, 'rendered': 0, 'failed': 0, 'errors': []}
+
+    def report(message):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append(message)
+
+    def valid_diaries():
+        for number, diary_data, error in iter_import_rows(fileobj, filename):
+            if error:
+                report(f"Row {number}: {error}")
+            else:
+                store.save(diary_data)
+                summary['imported'] += 1
+                yield diary_data
+            if progress is not None and not render:
+                progress(summary)
+
+    if not render:
+        for _ in valid_diaries():
+            pass
+        return summary
+
+    for result in iter_batch(valid_diaries(), output_dir, max_workers, submit=submit):
+        if result['error']:
+            report(f"Class {result['class']} {result['section']} ({result['date']}): {result['error']}")
+        else:
+            summary['rendered'] += 1
+        if progress is not None:
+            progress(summary)
+    return summary
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils.render_cache import render_diary_pdf_cached
+
+
+class QueueFull(Exception):
+    """
+    Raised when the render queue already holds as many jobs as it allows
+    """
+
+
+class RenderJob:
+    """
+    A diary render submitted to the queue
+    """
+
+    def __init__(self, job_id, future):
+        self.id = job_id
+        self.future = future
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    @property
+    def status(self):
+        if self.future.cancelled():
+            return 'cancelled'
+        if not self.future.done():
+            return 'running' if self.future.running() else 'queued'
+        return 'failed' if self.future.exception() else 'done'
+
+
+class RenderQueue:
+    """
+    Bounded queue of background diary renders.
+
+    At most max_workers renders run at once; at most max_pending jobs may be
+    queued or running, further submissions raise QueueFull so bursts are
+    smoothed instead of piling up. Finished jobs are kept for keep_seconds
+    so their PDFs can be collected.
+    """
+
+    def __init__(self, max_workers=None, max_pending=32, use_processes=True,
+                 keep_seconds=600, render=render_diary_pdf_cached):
+        if max_workers is None:
+            max_workers = min(4, os.cpu_count() or 1)
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self.max_workers = max_workers
+        self._executor = executor_class(max_workers=max_workers)
+        self._render = render
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._keep_seconds = keep_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, diary_data, timeout=None, render=None):
+        """
+        Queue a render and return its job id. Waits up to timeout seconds
+        for a free slot (no wait by default) before raising QueueFull.
+
+        render replaces the queue's render function for this job, e.g.
+        render_combined_pdf with a list of diaries as diary_data.
+        """
+        self._purge()
+        if timeout:
+            acquired = self._slots.acquire(timeout=timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            raise QueueFull("Too many diaries are being generated, please try again shortly")
+
+        try:
+            future = self._executor.submit(render or self._render, diary_data)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        job = RenderJob(uuid.uuid4().hex, future)
+        with self._lock:
+            self._jobs[job.id] = job
+
+        def finished(_):
+            job.finished_at = time.time()
+            self._slots.release()
+        future.add_done_callback(finished)
+        return job.id
+
+    def call(self, function, *args):
+        """
+        Run function(*args) on the queue's workers and return its future,
+        waiting for a free slot. For work that collects its own results,
+        e.g. iter_batch(..., submit=queue.call).
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown render job: {job_id}")
+        return job
+
+    def status(self, job_id):
+        """
+        Return the job's status: queued, running, done, failed or cancelled
+        """
+        return self._get(job_id).status
+
+    def error(self, job_id):
+        """
+        Return the exception of a failed job, or None
+        """
+        future = self._get(job_id).future
+        return future.exception() if future.done() and not future.cancelled() else None
+
+    def result(self, job_id, timeout=None):
+        """
+        Return the job's PDF bytes, waiting up to timeout seconds for it
+        """
+        return self._get(job_id).future.result(timeout=timeout)
+
+    def pending(self):
+        """
+        Number of jobs queued or running
+        """
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.future.done())
+
+    def _purge(self):
+        # Forget finished jobs nobody collected
+        cutoff = time.time() - self._keep_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,41 @@
+from utils.theme import get_theme
+
+
+class DiaryLayout:
+    """
+    What goes on a diary's pages, independent of the PDF engine: the info
+    table texts, the (subject name, entry) rows and the notes. Texts are
+    raw; each backend sanitizes or shapes them for its own fonts.
+    """
+
+    def __init__(self, date_text, class_text, teacher, subjects, notes):
+        self.date_text = date_text
+        self.class_text = class_text
+        self.teacher = teacher
+        self.subjects = subjects
+        self.notes = notes
+
+
+def diary_layout(diary_data, theme=None):
+    """
+    Build the layout of a diary in a theme's labels and subject names
+    """
+    theme = theme or get_theme(diary_data.get('template'))
+
+    class_text = str(diary_data['class'])
+    if diary_data.get('section'):
+        class_text += f" - Section {diary_data['section']}"
+
+    subjects = [
+        (theme.subject_mapping.get(key, key.title()), content.strip())
+        for key, content in diary_data['subjects'].items()
+        if content and content.strip()
+    ]
+
+    return DiaryLayout(
+        date_text=diary_data['date'].strftime('%A, %B %d, %Y'),
+        class_text=class_text,
+        teacher=diary_data.get('teacher') or '',
+        subjects=subjects,
+        notes=(diary_data.get('additional_notes') or '').strip(),
+    )
@@ -1,315 +1,639 @@
-from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, mm
-from reportlab.pdfgen import canvas
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus.tableofcontents import TableOfContents
+import copy
+import json
+import logging
 import os
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from reportlab.platypus import KeepInFrame
+from io import BytesIO
+from reportlab import rl_config
 
+from utils.assets import draw_cached_image, get_logos
+from utils.fonts import get_urdu_font, is_rtl, shape_text
+from utils.helpers import class_label, combined_filename
+from utils.layout import diary_layout
+from utils.profiles import get_output_profile
+from utils.sanitize import escape_markup, sanitize_text
+from utils.storage import get_output_storage
+from utils.theme import get_theme
 
 
+# Bump whenever the layout changes so cached renders are not reused
+TEMPLATE_VERSION = 2
 
-def generate_diary_pdf(diary_data):
+# Write binary streams as they are: ASCII85 only makes every image and
+# page stream a quarter larger. ReportLab reads this process-wide setting
+# while writing each stream and has no per-document switch, so importing
+# this module turns ASCII85 off for every PDF ReportLab writes in the
+# process (see utils.profiles)
+rl_config.useA85 = 0
+
+# Table cells hold at most this much text; longer entries continue on
+# extra rows so that rows split cleanly across pages
+MAX_CELL_CHARS = 800
+MIN_LINE_CHARS = 60
+
+logger = logging.getLogger(__name__)
+
+# Functions called with the record of every profiled render
+RENDER_LISTENERS = []
+
+
+class RenderStats:
+    """
+    Per-phase timings (seconds) and counters of one render.
+
+    Phases: story (building the tables, including text), text (sanitizing
+    and shaping cell text), build (ReportLab layout and drawing, including
+    header_footer), header_footer, logos and write (saving the file).
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self, diary_data=None):
+        """
+        Close the measurement, log it as one JSON record and pass the record
+        to the render listeners
+        """
+        phases = dict(self.phases)
+        if 'build' in phases:
+            phases['layout'] = phases['build'] - phases.get('header_footer', 0.0)
+        record = {
+            'event': 'diary_render',
+            'at': datetime.now().isoformat(timespec='seconds'),
+            'total_seconds': time.perf_counter() - self.started,
+            'phases': phases,
+            'counters': dict(self.counters),
+        }
+        if diary_data is not None:
+            record['date'] = diary_data['date'].isoformat()
+            record['class'] = diary_data['class']
+            record['section'] = diary_data.get('section') or ''
+        logger.info(json.dumps(record), extra={'render_stats': record})
+        for listener in RENDER_LISTENERS:
+            try:
+                listener(record)
+            except Exception:
+                logger.exception("Render listener failed")
+        return record
+
+
+def profiling_enabled():
     """
-    Generate a professional diary PDF with proper table formatting and dual logos
+    Whether every render is profiled (DIARY_RENDER_STATS or
+    DIARY_RENDER_STATS_LOG is set)
     """
+    return bool(os.environ.get('DIARY_RENDER_STATS') or os.environ.get('DIARY_RENDER_STATS_LOG'))
+
+
+def add_render_listener(listener):
+    """
+    Call listener(record) after every profiled render, e.g. to collect
+    timings across a day's traffic
+    """
+    RENDER_LISTENERS.append(listener)
+
+
+def jsonl_render_listener(path):
+    """
+    Listener appending each render record as a line of JSON to path
+    """
+    def write(record):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+    return write
+
+
+def render_stats_percentiles(records, percentiles=(50, 90, 99)):
+    """
+    Percentiles (nearest rank) of the total and per-phase times of render
+    records, as {metric: {'p50': seconds, ...}}
+    """
+    values = {}
+    for record in records:
+        values.setdefault('total', []).append(record['total_seconds'])
+        for name, seconds in record['phases'].items():
+            values.setdefault(name, []).append(seconds)
+
+    summary = {}
+    for name, samples in values.items():
+        samples.sort()
+        summary[name] = {
+            f"p{p}": samples[min(len(samples) - 1, round(p / 100 * (len(samples) - 1)))]
+            for p in percentiles
+        }
+    return summary
+
+
+# Exported from every process that renders, including pool workers
+if os.environ.get('DIARY_RENDER_STATS_LOG'):
+    add_render_listener(jsonl_render_listener(os.environ['DIARY_RENDER_STATS_LOG']))
+
+
+def _phase(stats, name):
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def generate_diary_pdf(diary_data, output_dir='output', profile=None, backend=None):
+    """
+    Generate a diary PDF and save it in output_dir, returning the file path.
+    profile is the output profile name ('print', 'screen' or 'mobile') and
+    backend the PDF engine (see utils.backends; default: the diary's
+    'backend' field, then DIARY_PDF_BACKEND, then ReportLab).
+    """
+    # Imported here: the backends module builds on this one
+    from utils.backends import get_backend
+
+    stats = RenderStats() if profiling_enabled() else None
+    pdf_bytes = get_backend(backend or diary_data.get('backend')).render(
+        diary_data, stats=stats, profile=profile)
+    with _phase(stats, 'write'):
+        filepath = save_diary_pdf(diary_data, pdf_bytes, output_dir)
+    if stats is not None:
+        stats.finish(diary_data)
+    return filepath
+
+def profile_diary_pdf(diary_data):
+    """
+    Render a diary with profiling on, returning (pdf_bytes, render record)
+    """
+    stats = RenderStats()
+    pdf_bytes = render_diary_pdf(diary_data, stats=stats)
+    return pdf_bytes, stats.finish(diary_data)
+
+def save_diary_pdf(diary_data, pdf_bytes, output_dir='output'):
+    """
+    Write already rendered PDF bytes into the date shard of output_dir,
+    returning the file path
+    """
+    return get_output_storage(output_dir).save_diary(diary_data, pdf_bytes)
+
+def render_diary_pdf(diary_data, generated_at=None, stats=None, profile=None):
+    """
+    Render a professional diary PDF with proper table formatting and dual logos
+    in memory and return the PDF bytes.
+
+    generated_at is the time shown as "Created on" in the footer (defaults to
+    now); it is fixed once per document so every page shows the same time.
+    stats (a RenderStats) collects timings; the caller finishes it. When
+    profiling is enabled for the process and no stats are given, the render
+    is profiled and logged on its own. profile names the output profile
+    (default: the diary's 'profile' field, then DIARY_PDF_PROFILE).
+    """
+    own_stats = stats is None and profiling_enabled()
+    if own_stats:
+        stats = RenderStats()
     
-    # Create filename
-    date_str = diary_data['date'].strftime('%Y_%m_%d')
-    class_name = diary_data['class'].replace(' ', '_')
-    filename = f"diary_{class_name}_{date_str}.pdf"
-    filepath = os.path.join('output', filename)
+    buffer = BytesIO()
+    theme = get_theme(diary_data.get('template'))
+    doc = create_diary_doc(buffer, generated_at, theme=theme,
+                           profile=profile or diary_data.get('profile'))
+    doc.render_stats = stats
     
-    # Create PDF document with custom margins for header space
-    doc = SimpleDocTemplate(
-        filepath,
-        pagesize=A4,
-        rightMargin=50,
-        leftMargin=50,
-        topMargin=140,  # Increased for header with logos
-        bottomMargin=80
-    )
+    with _phase(stats, 'story'):
+        story = diary_story(diary_data, stats, theme)
     
-    # Container for PDF elements
-    story = []
+    # Build PDF with custom page template
+    with _phase(stats, 'build'):
+        doc.build(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'SchoolTitle',
-        parent=styles['Title'],
-        fontSize=22,
-        textColor=colors.HexColor('#1a365d'),
-        alignment=TA_CENTER,
-        spaceAfter=8,
-        fontName='Helvetica-Bold',
-        letterSpacing=1
-    )
+    if stats is not None:
+        stats.count('pages', doc.page)
+        stats.count('bytes', buffer.tell())
+        if own_stats:
+            stats.finish(diary_data)
     
-    subtitle_style = ParagraphStyle(
-        'DiarySubtitle',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#2d3748'),
-        alignment=TA_CENTER,
-        spaceAfter=25,
-        fontName='Helvetica-Bold'
+    return buffer.getvalue()
+
+def generate_combined_pdf(diaries, output_dir='output', profile=None):
+    """
+    Generate one PDF holding several diaries and save it in output_dir,
+    returning the file path
+    """
+    diaries = list(diaries)
+    pdf_bytes = render_combined_pdf(diaries, profile=profile)
+    first_day = min(diary_data['date'] for diary_data in diaries)
+    return get_output_storage(output_dir).save(
+        combined_filename(diaries), pdf_bytes, first_day, kind='combined'
     )
+
+def render_combined_pdf(diaries, generated_at=None, profile=None):
+    """
+    Render several diaries (e.g. every class for a day) into a single PDF and
+    return its bytes.
+
+    The diaries share one document, so fonts and logos are embedded once.
+    A table of contents comes first and every diary starts on a new page
+    with a bookmark of its own.
+    """
+    diaries = list(diaries)
+    if not diaries:
+        raise ValueError("No diaries to combine")
+    
+    buffer = BytesIO()
+    theme = get_theme(diaries[0].get('template'))
+    doc = create_diary_doc(buffer, generated_at, CombinedDiaryDocTemplate, theme,
+                           profile or diaries[0].get('profile'))
+    
+    # Show the date next to the class only when the diaries span several days
+    show_date = len({diary_data['date'] for diary_data in diaries}) > 1
+    
+    story = [
+        Paragraph("TABLE OF CONTENTS", theme.section_header_style),
+        Spacer(1, 15),
+        TableOfContents(levelStyles=[theme.toc_entry_style]),
+    ]
+    for index, diary_data in enumerate(diaries):
+        title = class_label(diary_data)
+        if show_date:
+            title += diary_data['date'].strftime(' (%d %b %Y)')
+        
+        diary = diary_story(diary_data, theme=theme)
+        diary[0].diary_bookmark = (f"diary-{index}", sanitize_text(title, 'Helvetica'))
+        story.append(PageBreak())
+        story.extend(diary)
+    
+    # The table of contents needs a second pass to learn the page numbers
+    doc.multiBuild(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
     
-    section_header_style = ParagraphStyle(
-        'SectionHeader',
-        parent=styles['Heading3'],
-        fontSize=14,
-        textColor=colors.white,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold',
-        backColor=colors.HexColor('#2b6cb0'),
-        borderPadding=8
+    return buffer.getvalue()
+
+def create_diary_doc(buffer, generated_at=None, doc_class=SimpleDocTemplate, theme=None, profile=None):
+    """
+    Diary document writing to buffer, with the theme's margins leaving room
+    for the header and footer, in the named output profile
+    """
+    theme = theme or get_theme()
+    margins = theme.margins
+    doc = doc_class(
+        buffer,
+        pagesize=A4,
+        rightMargin=margins['right'],
+        leftMargin=margins['left'],
+        topMargin=margins['top'],  # Room for the header with logos
+        bottomMargin=margins['bottom']
     )
+    doc.diary_theme = theme
+    doc.output_profile = get_output_profile(profile)
+    doc.generated_at = generated_at or current_time(theme)
+    return doc
+
+class CombinedDiaryDocTemplate(SimpleDocTemplate):
+    """
+    Document of several diaries; the first flowable of each diary carries a
+    diary_bookmark (key, title) that becomes an outline and TOC entry
+    """
+    
+    def afterFlowable(self, flowable):
+        bookmark = getattr(flowable, 'diary_bookmark', None)
+        if bookmark is None:
+            return
+        key, title = bookmark
+        self.canv.bookmarkPage(key)
+        self.canv.addOutlineEntry(title, key, level=0)
+        self.canv.showOutline()
+        self.notify('TOCEntry', (0, title, self.page, key))
+
+class CellParagraph(Paragraph):
+    """
+    Paragraph for a table cell that keeps its line breaks while its width
+    stays the same; tables wrap every cell several times per build
+    (measuring, splitting across pages, drawing) and cached day sections
+    are laid out again in every digest
+    """
+    
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, '_wrapped_width', None) != availWidth:
+            # The height only depends on the width
+            self._wrapped_size = Paragraph.wrap(self, availWidth, availHeight)
+            self._wrapped_width = availWidth
+        return self._wrapped_size
+
+def diary_story(diary_data, stats=None, theme=None, cells=None):
+    """
+    Build the flowables of one diary: info table, subjects and notes.
+
+    cells, a dict, keeps the table cells' paragraphs with their line breaks
+    for later layouts of the same diary (digests). The tables get copies, so
+    the cached paragraphs themselves are never drawn or split.
+    """
+    # Container for PDF elements
+    story = []
     
-    # Helper function to clean text for PDF compatibility
+    # Shared styles, compiled once per template
+    theme = theme or get_theme(diary_data.get('template'))
+    text = theme.text
+    info_widths = theme.info_col_widths
+    subject_widths = theme.subjects_col_widths
+    notes_widths = theme.notes_col_widths
+    section_header_style = theme.section_header_style
+    
+    # Text drawn with the table fonts is made safe in a single pass
     def clean_text(text):
-        if not text:
-            return ""
-        # Replace problematic Unicode characters
-        text = str(text)
-        text = text.replace('-', '-')  # En dash to hyphen
-        text = text.replace('—', '-')  # Em dash to hyphen
-        text = text.replace(''', "'")  # Smart quote
-        text = text.replace(''', "'")  # Smart quote
-        text = text.replace('"', '"')  # Smart quote
-        text = text.replace('"', '"')  # Smart quote
-        # Remove any other non-ASCII characters
-        text = ''.join(char if ord(char) < 128 else '?' for char in text)
-        return text
+        with _phase(stats, 'text'):
+            return sanitize_text(text, 'Helvetica')
+    
+    # Urdu/Arabic text is shaped and drawn right-aligned with the Urdu font
+    urdu_font = get_urdu_font()
+    
+    def rtl_cell(text, width, font_size=10):
+        """Shaped text for an RTL cell, or None if text is not RTL"""
+        if urdu_font and is_rtl(text):
+            return shape_text(text, urdu_font, font_size, width - 24)
+        return None
+    
+    def rtl_cell_style(col, row):
+        return [
+            ('FONTNAME', (col, row), (col, row), urdu_font),
+            ('ALIGN', (col, row), (col, row), 'RIGHT'),
+        ]
     
-    # Basic Information Section (as a clean table)
-    date_formatted = diary_data['date'].strftime('%A, %B %d, %Y')
-    class_info = clean_text(diary_data['class'])
-    if diary_data.get('section'):
-        class_info += f" - Section {clean_text(diary_data['section'])}"
+    def table_cell(key, width, make):
+        """CellParagraph from make(), or a copy of the one in cells"""
+        if cells is None:
+            return make()
+        cell = cells.get(key)
+        if cell is None:
+            cell = make()
+            # Break the lines for the width the table gives it (12pt padding
+            # on each side); copies share them
+            cell.wrap(width - 24, A4[1])
+            cells[key] = cell
+        return copy.copy(cell)
+    
+    def paragraph_cell(text, width):
+        """Wrapped Paragraph for a table cell"""
+        def make():
+            with _phase(stats, 'text'):
+                shaped = rtl_cell(text, width)
+                if shaped is not None:
+                    markup, style = escape_markup(shaped), theme.rtl_cell_style(urdu_font)
+                else:
+                    markup, style = sanitize_text(text, 'Helvetica', markup=True), theme.cell_style
+            return CellParagraph(markup, style)
+        return table_cell((text, width), width, make)
+    
+    def add_rows(data, label, text, width, extra_style):
+        """
+        Add label/text rows, continuing long text on extra rows that keep the
+        background of the first one
+        """
+        first_row = len(data)
+        for i, chunk in enumerate(split_cell_text(text)):
+            data.append([label if i == 0 else '', paragraph_cell(chunk, width)])
+        if len(data) - first_row > 1:
+            color = theme.row_colors[(first_row - 1) % 2]
+            extra_style.append(('BACKGROUND', (0, first_row), (-1, len(data) - 1), color))
+    
+    # The texts of the diary, shared with the other backends
+    layout = diary_layout(diary_data, theme)
     
-    # Create info table
+    # Basic Information Section (as a clean table)
     info_data = [
-        ['Date:', date_formatted, 'Level:', class_info],
+        ['Date:', layout.date_text, 'Level:', clean_text(layout.class_text)],
     ]
     
-    if diary_data.get('teacher'):
-        info_data.append(['Teacher:', clean_text(diary_data['teacher']), '', ''])
-    
-    info_table = Table(info_data, colWidths=[1*inch, 2.2*inch, 1*inch, 2.2*inch])
-    info_table.setStyle(TableStyle([
-        # Header styling
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f7fafc')),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2d3748')),
-        ('TEXTCOLOR', (2, 0), (2, -1), colors.HexColor('#2d3748')),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTNAME', (3, 0), (3, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-        ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.HexColor('#f7fafc')]),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-    ]))
+    info_rtl_style = []
+    if layout.teacher:
+        teacher = rtl_cell(layout.teacher, info_widths[1], 11)
+        if teacher is None:
+            teacher = clean_text(layout.teacher)
+        else:
+            info_rtl_style += rtl_cell_style(1, 1)
+        info_data.append(['Teacher:', teacher, '', ''])
+    
+    info_table = Table(info_data, colWidths=info_widths)
+    info_table.setStyle(theme.info_table_style)
+    if info_rtl_style:
+        info_table.setStyle(TableStyle(info_rtl_style))
     
     story.append(info_table)
     story.append(Spacer(1, 25))
     
     # Subject Entries Section Header
-    story.append(Paragraph("SUBJECT-WISE DIARY ENTRIES", section_header_style))
+    story.append(Paragraph(escape_markup(text['subjects_heading']), section_header_style))
     story.append(Spacer(1, 15))
     
-    # Subject mapping for better display
-    subject_mapping = {
-        'english': 'English & WorkBook',
-        'urdu': 'Urdu', 
-        'math': 'Mathematics',
-        'science': 'Science',
-        'islamiat': 'Islamic Studies',
-        'nardban': 'Nardban',
-        'masharti_ulom': 'Masharti Ulom',
-        'rasool_e_arabi': 'Rasool e Arabi',
-    }
-    
     # Create subjects table
-    subject_data = [['Subject', 'Homework / Notes']]  # Header row
+    subject_data = [[text['subject_column'], text['content_column']]]  # Header row
     
     # Add subjects with content
-    has_content = False
-    for subject_key, content in diary_data['subjects'].items():
-        if content and content.strip():
-            has_content = True
-            subject_name = subject_mapping.get(subject_key, subject_key.title())
-            # Format content properly for table cell and clean it
-            formatted_content = clean_text(content.strip())
-            subject_data.append([subject_name, formatted_content])
+    subjects_extra_style = []
+    for subject_name, content in layout.subjects:
+        # Wrapped, cleaned content; long entries continue on extra rows
+        def make_name(subject_name=subject_name):
+            with _phase(stats, 'text'):
+                name_markup = sanitize_text(subject_name, 'Helvetica', markup=True)
+            return CellParagraph(name_markup, theme.cell_bold_style)
+        name_cell = table_cell((subject_name, subject_widths[0], 'bold'), subject_widths[0], make_name)
+        add_rows(subject_data, name_cell, content, subject_widths[1], subjects_extra_style)
     
     # Add empty subjects if no content
-    if not has_content:
-        subject_data.append(['No entries', 'No homework assigned for today'])
-    
-    # Create the subjects table
-    subjects_table = Table(subject_data, colWidths=[2*inch, 4.5*inch])
-    subjects_table.setStyle(TableStyle([
-        # Header row styling
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2b6cb0')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        
-        # Data rows styling
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2d3748')),
-        ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),  # Subject names bold
-        ('FONTNAME', (1, 1), (1, -1), 'Helvetica'),       # Content normal
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        
-        # Grid and borders
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#2b6cb0')),
-        
-        # Padding
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        
-        # Alternating row colors
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f7fafc')])
-    ]))
+    if not layout.subjects:
+        subject_data.append([text['no_entries'], text['no_homework']])
+    
+    # Create the subjects table, repeating the header row on every page
+    subjects_table = Table(subject_data, colWidths=subject_widths, repeatRows=1, splitByRow=1)
+    subjects_table.setStyle(theme.subjects_table_style)
+    if subjects_extra_style:
+        subjects_table.setStyle(TableStyle(subjects_extra_style))
     
     story.append(subjects_table)
     story.append(Spacer(1, 25))
     
     # Additional Notes Section
-    if diary_data.get('additional_notes') and diary_data['additional_notes'].strip():
-        story.append(Paragraph("ADDITIONAL NOTES & ANNOUNCEMENTS", section_header_style))
+    if layout.notes:
+        story.append(Paragraph(escape_markup(text['notes_heading']), section_header_style))
         story.append(Spacer(1, 15))
         
         # Create notes table
-        notes_data = [
-            ['Additional Information', clean_text(diary_data['additional_notes'].strip())]
-        ]
+        notes_data = []
+        add_rows(notes_data, text['notes_label'], layout.notes, notes_widths[1], [])
         
-        notes_table = Table(notes_data, colWidths=[2*inch, 4.5*inch])
-        notes_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, 0), colors.HexColor('#38a169')),
-            ('BACKGROUND', (1, 0), (1, 0), colors.white),
-            ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-            ('TEXTCOLOR', (1, 0), (1, 0), colors.HexColor('#2d3748')),
-            ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, 0), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e2e8f0')),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('LEFTPADDING', (0, 0), (-1, -1), 12),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ]))
+        notes_table = Table(notes_data, colWidths=notes_widths, splitByRow=1)
+        notes_table.setStyle(theme.notes_table_style)
         
         story.append(notes_table)
     
-    # Build PDF with custom page template
-    doc.build(story, onFirstPage=create_header_footer, onLaterPages=create_header_footer)
+    if stats is not None:
+        stats.count('table_rows', sum(len(flowable._cellvalues) for flowable in story if isinstance(flowable, Table)))
     
-    return filepath
+    return story
+
+def split_cell_text(text, limit=MAX_CELL_CHARS):
+    """
+    Split text at line or word breaks into chunks small enough that a table
+    row never grows taller than a page (every line counts as at least
+    MIN_LINE_CHARS characters)
+    """
+    pieces = []
+    for line in text.split('\n'):
+        while len(line) > limit:
+            cut = line.rfind(' ', 0, limit)
+            if cut <= 0:
+                cut = limit
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip(' ')
+        pieces.append(line)
+    
+    chunks = []
+    current = []
+    size = 0
+    for piece in pieces:
+        cost = max(len(piece), MIN_LINE_CHARS)
+        if current and size + cost > limit:
+            chunks.append('\n'.join(current))
+            current = []
+            size = 0
+        current.append(piece)
+        size += cost
+    chunks.append('\n'.join(current))
+    return chunks
+
+def current_time(theme=None):
+    """
+    Current time in the school's timezone (local time if pytz is missing)
+    """
+    pk_tz = (theme or get_theme()).timezone
+    return datetime.now(pk_tz) if pk_tz is not None else datetime.now()
+
+def format_generation_time(moment):
+    """
+    Format the "Created on" footer time
+    """
+    if moment.tzinfo is not None:
+        return moment.strftime('%B %d, %Y at %I:%M %p %Z')
+    return moment.strftime('%B %d, %Y at %I:%M %p')
+
+# Name of the form XObject holding a document's page chrome
+CHROME_FORM = 'diaryPageChrome'
 
 def create_header_footer(canvas, doc):
     """
-    Create professional header with dual logos and footer
+    Create professional header with dual logos and footer.
+
+    Everything but the page number is the same on every page of a document
+    (including the single "Created on" time), so it is drawn once into a
+    form XObject that each page then references.
     """
+    stats = getattr(doc, 'render_stats', None)
+    start = time.perf_counter()
+    
     # Page dimensions
     width, height = A4
+    theme = getattr(doc, 'diary_theme', None) or get_theme()
+    
+    # multiBuild starts a new canvas per pass, so the form belongs to the canvas
+    if not getattr(canvas, '_diary_chrome', False):
+        canvas.beginForm(CHROME_FORM)
+        draw_page_chrome(canvas, doc, theme)
+        canvas.endForm()
+        canvas._diary_chrome = True
+    canvas.doForm(CHROME_FORM)
+    
+    # Page number
+    canvas.saveState()
+    canvas.setFont("Helvetica", 9)
+    canvas.setFillColor(theme.colors['muted'])
+    canvas.drawRightString(width - 60, 35, f"Page {canvas.getPageNumber()}")
+    canvas.restoreState()
+    
+    if stats is not None:
+        stats.add('header_footer', time.perf_counter() - start)
+
+def draw_page_chrome(canvas, doc, theme):
+    """
+    Draw the parts of the header and footer shared by every page
+    """
+    stats = getattr(doc, 'render_stats', None)
+    width, height = A4
+    palette = theme.colors
+    header_height = theme.header_height
+    logo_size = theme.logo_size
     
     # Header section
     canvas.saveState()
     
     # Header background
-    canvas.setFillColor(colors.HexColor('#f7fafc'))
-    canvas.rect(0, height - 130, width, 130, fill=1, stroke=0)
+    canvas.setFillColor(palette['background'])
+    canvas.rect(0, height - header_height, width, header_height, fill=1, stroke=0)
     
     # Header border
-    canvas.setStrokeColor(colors.HexColor('#2b6cb0'))
+    canvas.setStrokeColor(palette['primary'])
     canvas.setLineWidth(3)
-    canvas.line(0, height - 130, width, height - 130)
+    canvas.line(0, height - header_height, width, height - header_height)
     
-    # Logo positions
-    left_logo_path = 'assets/school_logo.png'
-    right_logo_path = 'assets/school_logo_right.png'  # You can use same logo or different
-
+    # Logos are resolved once per document and drawn from the asset cache,
+    # resampled for the output profile
+    logos = getattr(doc, '_diary_logos', None)
+    if logos is None:
+        profile = getattr(doc, 'output_profile', None) or get_output_profile()
+        logos = doc._diary_logos = get_logos(*theme.logo_paths, **profile.logo_options(logo_size))
+    left_logo, right_logo = logos
+    logos_start = time.perf_counter()
     
     # Left logo
-    if os.path.exists(left_logo_path):
+    if left_logo:
         try:
-            canvas.drawImage(left_logo_path, 60, height - 100, width=80, height=80, 
-                           preserveAspectRatio=True, mask='auto')
+            draw_cached_image(canvas, left_logo, 60, height - 20 - logo_size, logo_size, logo_size)
+            if stats is not None:
+                stats.count('image_draws')
         except Exception as e:
             print(f"Could not load left logo: {e}")
     
-    # Right logo (use same logo if right logo doesn't exist)
-    right_logo = right_logo_path if os.path.exists(right_logo_path) else left_logo_path
-    if os.path.exists(right_logo):
+    # Right logo (same logo if right logo doesn't exist)
+    if right_logo:
         try:
-            canvas.drawImage(right_logo, width - 140, height - 100, width=80, height=80, 
-                           preserveAspectRatio=True, mask='auto')
+            draw_cached_image(canvas, right_logo, width - 60 - logo_size, height - 20 - logo_size, logo_size, logo_size)
+            if stats is not None:
+                stats.count('image_draws')
         except Exception as e:
             print(f"Could not load right logo: {e}")
     
+    if stats is not None:
+        stats.add('logos', time.perf_counter() - logos_start)
+    
     # School name and title
-    canvas.setFillColor(colors.HexColor('#1a365d'))
+    canvas.setFillColor(palette['title'])
     canvas.setFont("Helvetica-Bold", 18)
-    canvas.drawCentredString(width/2, height - 60, "AL-GHAZALI HIGH SCHOOL")
+    canvas.drawCentredString(width/2, height - 60, theme.school_name)
     
     canvas.setFont("Helvetica-Bold", 16)
-    canvas.setFillColor(colors.HexColor('#2d3748'))
-    canvas.drawCentredString(width/2, height - 85, "Daily Class Diary")
-    
-    # Decorative line under header
-    canvas.setStrokeColor(colors.HexColor('#2b6cb0'))
-    canvas.setLineWidth(2)
-    # canvas.line(50, height - 140, width - 50, height - 140)
-    
+    canvas.setFillColor(palette['text'])
+    canvas.drawCentredString(width/2, height - 85, theme.subtitle)
     
     # Footer section
     canvas.setFont("Helvetica", 9)
-    canvas.setFillColor(colors.HexColor('#718096'))
-    
-    # Generation info
-    try:
-        import pytz
-        pk_tz = pytz.timezone('Asia/Karachi')
-        current_time = datetime.now(pk_tz)
-        generation_time = current_time.strftime('%B %d, %Y at %I:%M %p PKT')
-    except:
-        generation_time = datetime.now().strftime('%B %d, %Y at %I:%M %p')
-    canvas.drawCentredString(width/2, 50, "Generated by IT Department - Al-Ghazali High School")
-    canvas.drawCentredString(width/2, 35, f"Created on {generation_time}")
+    canvas.setFillColor(palette['muted'])
     
-    # Page number
-    page_num = canvas.getPageNumber()
-    canvas.drawRightString(width - 60, 35, f"Page {page_num}")
+    # Generation info, fixed once per document
+    generation_time = format_generation_time(getattr(doc, 'generated_at', None) or current_time(theme))
+    canvas.drawCentredString(width/2, 50, theme.footer_text)
+    canvas.drawCentredString(width/2, 35, f"Created on {generation_time}")
     
     # Footer line
-    canvas.setStrokeColor(colors.HexColor('#e2e8f0'))
+    canvas.setStrokeColor(palette['grid'])
     canvas.setLineWidth(1)
     canvas.line(50, 25, width - 50, 25)
     
-    canvas.restoreState()
\ No newline at end of file
+    canvas.restoreState()
@@ -0,0 +1,210 @@
+"""
+Instant HTML preview of a diary, drawn from the same layout as the PDF
+(utils.layout) without building it.
+
+Every table row is turned into HTML and measured once per text and cached,
+so after an edit only the changed fields are redone. The page count is
+estimated by wrapping the texts with the PDF fonts' metrics and stacking
+the row heights on A4 pages the way the subjects table splits.
+"""
+import html
+from functools import lru_cache
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.utils import simpleSplit
+
+from utils.fonts import get_urdu_font, is_rtl, shape_text
+from utils.layout import diary_layout
+from utils.pdf_generator import split_cell_text
+from utils.theme import get_theme
+
+
+# Heights in points of the fixed parts of a diary, as laid out by
+# diary_story and the theme's table styles
+INFO_ROW_HEIGHT = 12 + 16
+HEADING_ROW_HEIGHT = 12 + 20
+SECTION_HEADER_HEIGHT = 14
+CELL_PADDING = 20
+
+
+class DiaryPreview:
+    """
+    HTML of a diary's pages and the number of PDF pages it should take
+    """
+
+    def __init__(self, html, estimated_pages):
+        self.html = html
+        self.estimated_pages = estimated_pages
+
+
+def _css_color(color):
+    return '#' + color.hexval()[2:]
+
+
+def _long_word_line_count(line, font_name, font_size, width):
+    """
+    Lines of a line holding words wider than the column, which the cell's
+    Paragraph (splitLongWords) breaks to fill each line
+    """
+    space = stringWidth(' ', font_name, font_size)
+    count = 1
+    used = 0
+    for word in line.split():
+        word_width = stringWidth(word, font_name, font_size)
+        gap = space if used else 0
+        if used + gap + word_width <= width:
+            used += gap + word_width
+        elif word_width <= width:
+            count += 1
+            used = word_width
+        else:
+            used += gap
+            for char in word:
+                char_width = stringWidth(char, font_name, font_size)
+                if used + char_width > width:
+                    count += 1
+                    used = 0
+                used += char_width
+    return count
+
+
+def _line_count(text, font_name, font_size, width):
+    # Empty lines still take a line in the PDF; simpleSplit drops them,
+    # and keeps a word wider than the column whole
+    count = 0
+    for line in text.split('\n'):
+        wrapped = simpleSplit(line, font_name, font_size, width)
+        if any(stringWidth(piece, font_name, font_size) > width for piece in wrapped):
+            count += _long_word_line_count(line, font_name, font_size, width)
+        else:
+            count += max(1, len(wrapped))
+    return count
+
+
+@lru_cache(maxsize=1024)
+def _text_height(text, width, bold=False):
+    """
+    Height of a wrapped 10pt table cell holding text in a column width
+    points wide
+    """
+    urdu_font = get_urdu_font()
+    if urdu_font and is_rtl(text):
+        lines = shape_text(text, urdu_font, 10, width - 24).count('\n') + 1
+        return lines * 16 + CELL_PADDING
+    font_name = 'Helvetica-Bold' if bold else 'Helvetica'
+    return _line_count(text, font_name, 10, width - 24) * 13 + CELL_PADDING
+
+
+@lru_cache(maxsize=1024)
+def _row_heights(label, text, label_width, text_width):
+    """
+    Heights of the table rows of one subject or note (long text continues
+    on extra rows, see split_cell_text)
+    """
+    heights = [_text_height(chunk, text_width) for chunk in split_cell_text(text)]
+    heights[0] = max(heights[0], _text_height(label, label_width, bold=True))
+    return tuple(heights)
+
+
+@lru_cache(maxsize=1024)
+def _cell_html(text, bold=False):
+    markup = html.escape(text).replace('\n', '<br>')
+    if bold:
+        markup = f'<strong>{markup}</strong>'
+    if is_rtl(text):
+        return f'<td class="rtl" dir="rtl">{markup}</td>'
+    return f'<td>{markup}</td>'
+
+
+def estimate_pages(layout, theme):
+    """
+    Number of A4 pages the PDF of a layout should take
+    """
+    margins = theme.margins
+    # Frames add 6pt of padding on each side
+    frame_height = A4[1] - margins['top'] - margins['bottom'] - 12
+    pages = 1
+    used = 0
+
+    def place(height, repeat=0):
+        # Anything that doesn't fit (spacers too) moves to the next page;
+        # repeat is the height of the table heading repeated there
+        nonlocal pages, used
+        if used and used + height > frame_height:
+            pages += 1
+            used = repeat
+        used += height
+
+    def section_header():
+        # 12pt before (dropped at the top of a page) and 6pt after
+        nonlocal used
+        place(SECTION_HEADER_HEIGHT + (12 if used else 0))
+        used += 6
+        place(15)
+
+    place(INFO_ROW_HEIGHT * (2 if layout.teacher else 1))
+    place(25)
+
+    section_header()
+    place(HEADING_ROW_HEIGHT)
+    label_width, text_width = theme.subjects_col_widths
+    for name, content in layout.subjects:
+        for height in _row_heights(name, content, label_width, text_width):
+            place(height, repeat=HEADING_ROW_HEIGHT)
+    if not layout.subjects:
+        place(12 + CELL_PADDING)
+    place(25)
+
+    if layout.notes:
+        section_header()
+        label_width, text_width = theme.notes_col_widths
+        for height in _row_heights(theme.text['notes_label'], layout.notes, label_width, text_width):
+            place(height)
+    return pages
+
+
+def diary_preview(diary_data):
+    """
+    Build the HTML preview of a diary and estimate its page count
+    """
+    theme = get_theme(diary_data.get('template'))
+    layout = diary_layout(diary_data, theme)
+    text = theme.text
+    palette = theme.colors
+    variables = ';'.join(
+        f'--diary-{name}:{_css_color(palette[name])}'
+        for name in ('primary', 'title', 'text', 'background', 'grid', 'notes')
+    )
+
+    parts = [
+        f'<div class="diary-preview" style="{variables}">',
+        f'<div class="diary-preview-title">{html.escape(theme.school_name)}</div>',
+        f'<div class="diary-preview-subtitle">{html.escape(theme.subtitle)}</div>',
+        '<table class="diary-preview-info"><tr>',
+        f'<th>Date:</th><td>{html.escape(layout.date_text)}</td>',
+        f'<th>Level:</th><td>{html.escape(layout.class_text)}</td></tr>',
+    ]
+    if layout.teacher:
+        parts.append(f'<tr><th>Teacher:</th>{_cell_html(layout.teacher)}<td></td><td></td></tr>')
+    parts.append('</table>')
+
+    parts.append(f'<div class="diary-preview-section">{html.escape(text["subjects_heading"])}</div>')
+    parts.append('<table class="diary-preview-subjects">')
+    parts.append(f'<tr><th>{html.escape(text["subject_column"])}</th>'
+                 f'<th>{html.escape(text["content_column"])}</th></tr>')
+    for name, content in layout.subjects:
+        parts.append(f'<tr>{_cell_html(name, bold=True)}{_cell_html(content)}</tr>')
+    if not layout.subjects:
+        parts.append(f'<tr><td><strong>{html.escape(text["no_entries"])}</strong></td>'
+                     f'<td>{html.escape(text["no_homework"])}</td></tr>')
+    parts.append('</table>')
+
+    if layout.notes:
+        parts.append(f'<div class="diary-preview-section">{html.escape(text["notes_heading"])}</div>')
+        parts.append('<table class="diary-preview-notes">')
+        parts.append(f'<tr><th>{html.escape(text["notes_label"])}</th>{_cell_html(layout.notes)}</tr>')
+        parts.append('</table>')
+    parts.append('</div>')
+
+    return DiaryPreview(''.join(parts), estimate_pages(layout, theme))
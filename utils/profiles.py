@@ -0,0 +1,57 @@
+"""
+Output profiles: how much logo quality a PDF keeps for its file size.
+
+Whatever the profile, pages are compressed and streams are written as
+binary rather than ASCII85. The latter is ReportLab's process-wide
+rl_config.useA85, which utils.pdf_generator turns off on import, so it
+also applies to any other PDF ReportLab writes in the same process.
+"""
+import math
+import os
+
+
+class OutputProfile:
+    """
+    How a PDF trades file size against image quality: logos are resampled to
+    logo_dpi at their printed size (None keeps the original pixels) and
+    re-encoded as JPEG when jpeg_quality is set
+    """
+
+    def __init__(self, name, logo_dpi=None, jpeg_quality=None, description=''):
+        self.name = name
+        self.logo_dpi = logo_dpi
+        self.jpeg_quality = jpeg_quality
+        self.description = description
+
+    def logo_options(self, logo_size):
+        """
+        get_logos() keyword arguments for logos drawn logo_size points wide
+        """
+        if self.logo_dpi is None:
+            return {}
+        return {
+            'max_pixels': math.ceil(logo_size * self.logo_dpi / 72),
+            'jpeg_quality': self.jpeg_quality,
+        }
+
+
+OUTPUT_PROFILES = {
+    'print': OutputProfile('print', description="Original logos, for printing"),
+    'screen': OutputProfile('screen', logo_dpi=150, description="Logos at 150 dpi, lossless"),
+    'mobile': OutputProfile('mobile', logo_dpi=96, jpeg_quality=60,
+                            description="Logos at 96 dpi as JPEG, smallest for WhatsApp/SMS"),
+}
+
+DEFAULT_PROFILE = 'print'
+
+
+def get_output_profile(name=None):
+    """
+    Return the named output profile, falling back to the DIARY_PDF_PROFILE
+    environment variable and then to 'print'
+    """
+    name = name or os.environ.get('DIARY_PDF_PROFILE') or DEFAULT_PROFILE
+    try:
+        return OUTPUT_PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF profile {name!r} (choose from {', '.join(OUTPUT_PROFILES)})")
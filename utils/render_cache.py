@@ -0,0 +1,249 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from utils.assets import get_logos
+from utils.backends import get_backend
+from utils.pdf_generator import TEMPLATE_VERSION
+from utils.profiles import get_output_profile
+from utils.storage import retention_from_env, write_atomic
+from utils.theme import get_theme
+
+
+CACHE_DIR = os.path.join('output', 'cache')
+
+# Disk space the cached PDFs may take before the least recently used are
+# deleted; pruning stops once they are back under PRUNE_TO of it
+DEFAULT_MAX_DISK_MB = 256
+PRUNE_TO = 0.8
+
+
+def max_disk_bytes_from_env():
+    """
+    Disk budget of the render cache from DIARY_RENDER_CACHE_MB (default
+    256, 0 for no limit)
+    """
+    value = os.environ.get('DIARY_RENDER_CACHE_MB', '').strip()
+    try:
+        megabytes = int(value) if value else DEFAULT_MAX_DISK_MB
+    except ValueError:
+        print(f"Ignoring DIARY_RENDER_CACHE_MB={value!r}: not a number of megabytes")
+        megabytes = DEFAULT_MAX_DISK_MB
+    return megabytes * 1024 * 1024
+
+
+def normalize_diary_data(diary_data):
+    """
+    Reduce diary_data to the fields that affect the rendered PDF, in a stable
+    JSON-serialisable form
+    """
+    subjects = [
+        [key, content.strip()]
+        for key, content in diary_data['subjects'].items()
+        if content and content.strip()
+    ]
+    return {
+        'date': diary_data['date'].isoformat(),
+        'class': str(diary_data['class']).strip(),
+        'section': (diary_data.get('section') or '').strip(),
+        'teacher': (diary_data.get('teacher') or '').strip(),
+        # Subject order is kept: it is the row order in the PDF
+        'subjects': subjects,
+        'additional_notes': (diary_data.get('additional_notes') or '').strip(),
+    }
+
+
+def diary_cache_key(diary_data):
+    """
+    Stable content hash of a diary plus the template, output profile, PDF
+    backend and logo versions
+    """
+    theme = get_theme(diary_data.get('template'))
+    assets = [
+        [logo.path, logo.mtime] if logo else None
+        for logo in get_logos(*theme.logo_paths)
+    ]
+    payload = {
+        'template': [TEMPLATE_VERSION, theme.digest],
+        'profile': get_output_profile(diary_data.get('profile')).name,
+        'backend': get_backend(diary_data.get('backend')).name,
+        'assets': assets,
+        'diary': normalize_diary_data(diary_data),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed cache of rendered diary PDFs, kept in memory with LRU
+    eviction and persisted on disk.
+
+    On disk the least recently used PDFs are deleted once they take more
+    than max_disk_bytes, and PDFs unused for retention_days (the output
+    retention, DIARY_OUTPUT_RETENTION_DAYS) are deleted when it is set.
+    """
+
+    def __init__(self, max_entries=64, cache_dir=CACHE_DIR, max_disk_bytes=None,
+                 retention_days=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.retention_days = retention_days
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last prune plus those written since
+        self._disk_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _remember(self, key, pdf_bytes):
+        with self._lock:
+            self._entries[key] = pdf_bytes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Return the cached PDF bytes for key, or None
+        """
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+                return pdf_bytes
+
+        if self.cache_dir:
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    pdf_bytes = f.read()
+                # The modification time is the last use, for prune
+                os.utime(path)
+            except OSError:
+                return None
+            self._remember(key, pdf_bytes)
+            return pdf_bytes
+
+        return None
+
+    def put(self, key, pdf_bytes):
+        """
+        Store PDF bytes in memory and on disk
+        """
+        self._remember(key, pdf_bytes)
+
+        if self.cache_dir:
+            write_atomic(self._path(key), pdf_bytes)
+            with self._lock:
+                if self._disk_bytes is not None:
+                    self._disk_bytes += len(pdf_bytes)
+                due = self._disk_bytes is None or (
+                    self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes
+                )
+            if due:
+                self.prune()
+
+    def prune(self, max_disk_bytes=None, retention_days=None):
+        """
+        Delete the cached PDFs on disk unused for retention_days, then the
+        least recently used ones until they take at most PRUNE_TO of
+        max_disk_bytes (both default to the cache's settings); returns the
+        number of files deleted
+        """
+        max_disk_bytes = max_disk_bytes or self.max_disk_bytes
+        retention_days = retention_days or self.retention_days
+        files = []
+        try:
+            entries = os.scandir(self.cache_dir)
+        except FileNotFoundError:
+            entries = None
+        if entries is not None:
+            with entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith('.pdf'):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - retention_days * 86400 if retention_days else None
+        target = max_disk_bytes * PRUNE_TO if max_disk_bytes and total > max_disk_bytes else None
+        deleted = 0
+        for mtime, size, path in files:
+            if not (cutoff and mtime < cutoff or target is not None and total > target):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # pruned by another process
+            total -= size
+            deleted += 1
+
+        with self._lock:
+            self._disk_bytes = total
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_render_cache = None
+
+
+def get_render_cache():
+    """
+    Return the process-wide render cache
+    """
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache(max_disk_bytes=max_disk_bytes_from_env(),
+                                    retention_days=retention_from_env())
+    return _render_cache
+
+
+def render_diary_pdf_cached(diary_data, cache=None):
+    """
+    Return the diary PDF bytes, rendering only if this exact diary (same
+    content, template, profile, backend and logos) has not been rendered
+    before.
+
+    The "Created on" time is the time of the first render, so repeated
+    requests get byte-identical PDFs.
+    """
+    cache = cache or get_render_cache()
+    key = diary_cache_key(diary_data)
+
+    pdf_bytes = cache.get(key)
+    if pdf_bytes is None:
+        pdf_bytes = get_backend(diary_data.get('backend')).render(diary_data)
+        cache.put(key, pdf_bytes)
+    return pdf_bytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prune the rendered PDFs cached in output/cache")
+    parser.add_argument('--max-mb', type=int,
+                        help="Disk space to keep the cache under (default: DIARY_RENDER_CACHE_MB or 256)")
+    parser.add_argument('--max-age-days', type=int,
+                        help="Delete PDFs unused for this many days "
+                             "(default: DIARY_OUTPUT_RETENTION_DAYS)")
+    args = parser.parse_args(argv)
+
+    cache = get_render_cache()
+    max_disk_bytes = args.max_mb * 1024 * 1024 if args.max_mb else None
+    deleted = cache.prune(max_disk_bytes, args.max_age_days)
+    print(f"{deleted} cached PDFs deleted")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
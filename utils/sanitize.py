@@ -0,0 +1,136 @@
+import re
+
+from reportlab.pdfbase import pdfmetrics
+
+
+# Fallbacks for characters the font cannot render (only used when the
+# replacement itself can be rendered)
+SUBSTITUTIONS = {
+    '–': '-',    # En dash
+    '—': '-',    # Em dash
+    '‘': "'",    # Smart quotes
+    '’': "'",
+    '“': '"',
+    '”': '"',
+    '…': '...',  # Ellipsis
+    '\u00a0': ' ',  # Non-breaking space
+    '۔': '.',    # Urdu full stop
+}
+
+# Characters with a meaning in ReportLab Paragraph markup ('&' must go first)
+MARKUP_ESCAPES = (
+    ('&', '&amp;'),
+    ('<', '&lt;'),
+    ('>', '&gt;'),
+    ('\n', '<br/>'),
+)
+
+REPLACEMENT_CHAR = '?'
+
+# font name -> translation table
+_tables = {}
+
+
+def renderable_chars(font_name):
+    """
+    Return the set of characters font_name has glyphs for
+    """
+    font = pdfmetrics.getFont(font_name)
+    face = getattr(font, 'face', None)
+    char_to_glyph = getattr(face, 'charToGlyph', None)
+    if char_to_glyph is not None:
+        # Embedded TrueType font: anything in its character map
+        return {chr(codepoint) for codepoint in char_to_glyph}
+
+    # Standard Type 1 fonts are written with WinAnsiEncoding (cp1252)
+    return set(bytes(range(256)).decode('cp1252', errors='ignore'))
+
+
+def _char_class(chars):
+    """
+    Build a regex character class body from a set of characters
+    """
+    codepoints = sorted(ord(char) for char in chars)
+    parts = []
+    start = end = codepoints[0]
+    for codepoint in codepoints[1:] + [None]:
+        if codepoint is not None and codepoint == end + 1:
+            end = codepoint
+            continue
+        if start == end:
+            parts.append(re.escape(chr(start)))
+        else:
+            parts.append(f"{re.escape(chr(start))}-{re.escape(chr(end))}")
+        if codepoint is not None:
+            start = end = codepoint
+    return ''.join(parts)
+
+
+class _TranslationTable(dict):
+    """
+    str.translate table that works out what to do with each code point the
+    first time it is seen. A single regex scan finds the runs of text that
+    need changing and only those are translated.
+    """
+
+    def __init__(self, font_name):
+        super().__init__()
+        self.renderable = renderable_chars(font_name)
+
+        # Only runs of characters outside this set go through the table;
+        # whitespace between such characters is folded into the same run
+        unchanged = {char for char in self.renderable if ord(char) >= 32}
+        unchanged |= {'\n', '\t'}
+        other = f"[^{_char_class(unchanged)}]"
+        self.needs_work = re.compile(f"{other}+(?:\\s+{other}+)*")
+
+    def translate_match(self, match):
+        return match.group().translate(self)
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        if char == '\r' or (codepoint < 32 and char not in '\n\t'):
+            value = None  # drop control characters
+        elif char in self.renderable:
+            value = char
+        else:
+            value = SUBSTITUTIONS.get(char)
+            if value is None or not set(value) <= self.renderable:
+                value = REPLACEMENT_CHAR
+        self[codepoint] = value
+        return value
+
+
+def get_translation_table(font_name='Helvetica'):
+    """
+    Return the shared translation table for a font
+    """
+    table = _tables.get(font_name)
+    if table is None:
+        table = _tables[font_name] = _TranslationTable(font_name)
+    return table
+
+
+def sanitize_text(text, font_name='Helvetica', markup=False):
+    """
+    Make text safe to draw with font_name: characters the font can render
+    are kept, others get an ASCII fallback or '?'. With
+    markup=True, &, < and > are escaped and newlines become <br/> for use
+    in a Paragraph.
+    """
+    if not text:
+        return ""
+    table = get_translation_table(font_name)
+    text = table.needs_work.sub(table.translate_match, str(text))
+    if markup:
+        text = escape_markup(text)
+    return text
+
+
+def escape_markup(text):
+    """
+    Escape already sanitized text for use in a ReportLab Paragraph
+    """
+    for char, escape in MARKUP_ESCAPES:
+        text = text.replace(char, escape)
+    return text
@@ -0,0 +1,384 @@
+"""
+Lifecycle of the generated PDFs in the output directory.
+
+Files are sharded by diary date (output/YYYY/MM/DD/<name>.pdf) so no
+directory grows without bound, written atomically (temp file plus rename)
+so concurrent renders of the same diary never leave a torn file, and
+recorded in an SQLite index so listing history never walks the tree.
+
+Retention is off by default; set DIARY_OUTPUT_RETENTION_DAYS (or pass
+retention_days) to delete shards older than that many days. It is applied
+at most once a day per process when files are saved, or on demand:
+
+    python -m utils.storage list --since 2025-07-01
+    python -m utils.storage prune --retention-days 90
+    python -m utils.storage compact
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+
+from utils.helpers import diary_filename, parse_diary_date
+
+
+OUTPUT_DIR = 'output'
+INDEX_NAME = 'index.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'diary',
+    class_name TEXT NOT NULL DEFAULT '',
+    section TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL,
+    written_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_date ON files (date);
+"""
+
+
+def retention_from_env():
+    """
+    Retention in days from DIARY_OUTPUT_RETENTION_DAYS, or None to keep
+    everything
+    """
+    value = os.environ.get('DIARY_OUTPUT_RETENTION_DAYS', '').strip()
+    if not value:
+        return None
+    try:
+        days = int(value)
+    except ValueError:
+        print(f"Ignoring DIARY_OUTPUT_RETENTION_DAYS={value!r}: not a number of days")
+        return None
+    return days if days > 0 else None
+
+
+def write_atomic(path, data):
+    """
+    Write bytes to path through a temp file in the same directory and a
+    rename, so readers see either the old file or the complete new one
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    # Created like open() would (0666 less the umask), unlike mkstemp's 0600
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class OutputStorage:
+    """
+    Date-sharded store of generated PDFs with an index for fast listing
+    """
+
+    def __init__(self, root=OUTPUT_DIR, retention_days=None):
+        self.root = root
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._retention_applied_on = None
+        os.makedirs(root, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread; batch workers in other processes open
+        # their own and WAL lets them write side by side
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, INDEX_NAME), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def shard_dir(self, day):
+        """
+        Directory holding the files of a date
+        """
+        day = parse_diary_date(day)
+        return os.path.join(self.root, f"{day.year:04d}", f"{day.month:02d}", f"{day.day:02d}")
+
+    def save(self, filename, pdf_bytes, day, kind='diary', class_name='', section=''):
+        """
+        Atomically write a PDF into the shard of day and index it,
+        returning the file path
+        """
+        if os.path.basename(filename) != filename or filename.startswith('.'):
+            raise ValueError(f"Not a plain file name: {filename!r}")
+        path = os.path.join(self.shard_dir(day), filename)
+        write_atomic(path, pdf_bytes)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._relative(path), parse_diary_date(day).isoformat(), kind,
+                    str(class_name), (section or '').strip(), len(pdf_bytes),
+                    datetime.now().isoformat(timespec='seconds'),
+                ),
+            )
+        self._apply_retention_daily()
+        return path
+
+    def save_diary(self, diary_data, pdf_bytes):
+        """
+        Save the PDF of a single diary under its date, returning the path
+        """
+        return self.save(diary_filename(diary_data), pdf_bytes, diary_data['date'],
+                         class_name=diary_data['class'], section=diary_data.get('section'))
+
+    def list(self, start=None, end=None, kind=None, class_name=None):
+        """
+        List indexed files (path, date, kind, class, section, size,
+        written_at), newest date first
+        """
+        query = "SELECT * FROM files WHERE 1 = 1"
+        params = []
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(parse_diary_date(start).isoformat())
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(parse_diary_date(end).isoformat())
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if class_name is not None:
+            query += " AND class_name = ?"
+            params.append(str(class_name))
+        query += " ORDER BY date DESC, path"
+        return [
+            {
+                'path': os.path.join(self.root, row['path']),
+                'date': parse_diary_date(row['date']),
+                'kind': row['kind'],
+                'class': row['class_name'],
+                'section': row['section'],
+                'size': row['size'],
+                'written_at': row['written_at'],
+            }
+            for row in self._connection().execute(query, params)
+        ]
+
+    def prune(self, retention_days=None, today=None):
+        """
+        Delete the files of dates older than retention_days (default: the
+        storage's retention) and their index entries; returns the number of
+        files deleted
+        """
+        retention_days = retention_days or self.retention_days
+        if not retention_days:
+            return 0
+        cutoff = (today or date.today()) - timedelta(days=retention_days)
+
+        with self._connection() as conn:
+            paths = [row['path'] for row in conn.execute(
+                "SELECT path FROM files WHERE date < ?", (cutoff.isoformat(),)
+            )]
+            conn.execute("DELETE FROM files WHERE date < ?", (cutoff.isoformat(),))
+
+        for relative in paths:
+            try:
+                os.remove(os.path.join(self.root, relative))
+            except FileNotFoundError:
+                pass  # already removed by another process
+        self._remove_old_shards(cutoff)
+        return len(paths)
+
+    def compact(self):
+        """
+        Bring the index and the tree back in line: move flat files left in
+        the root by older versions into their date shards, drop index
+        entries of missing files, index unindexed ones and remove empty
+        shard directories. Returns (moved, dropped, added) counts.
+        """
+        moved = self._shard_flat_files()
+
+        with self._connection() as conn:
+            indexed = {row['path'] for row in conn.execute("SELECT path FROM files")}
+            on_disk = set(self._walk_shards())
+            missing = indexed - on_disk
+            conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in missing])
+            for relative in sorted(on_disk - indexed):
+                full = os.path.join(self.root, relative)
+                conn.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (relative, self._shard_date(relative).isoformat(), _guess_kind(relative),
+                     '', '', os.path.getsize(full),
+                     datetime.fromtimestamp(os.path.getmtime(full)).isoformat(timespec='seconds')),
+                )
+        self._remove_old_shards(None)
+        self._connection().execute("VACUUM")
+        return moved, len(missing), len(on_disk - indexed)
+
+    def _apply_retention_daily(self):
+        today = date.today()
+        if self.retention_days and self._retention_applied_on != today:
+            self._retention_applied_on = today
+            self.prune(today=today)
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def _shard_date(self, relative):
+        year, month, day = relative.split('/')[:3]
+        return date(int(year), int(month), int(day))
+
+    def _walk_shards(self):
+        """
+        Yield the relative paths of all PDFs in the date shards
+        """
+        for year in _subdirs(self.root):
+            for month in _subdirs(os.path.join(self.root, year)):
+                for day in _subdirs(os.path.join(self.root, year, month)):
+                    shard = os.path.join(self.root, year, month, day)
+                    for entry in os.scandir(shard):
+                        if entry.is_file() and entry.name.endswith('.pdf'):
+                            yield f"{year}/{month}/{day}/{entry.name}"
+
+    def _remove_old_shards(self, cutoff):
+        """
+        Remove empty shard directories, and every shard before cutoff
+        """
+        for year in _subdirs(self.root):
+            year_dir = os.path.join(self.root, year)
+            for month in _subdirs(year_dir):
+                month_dir = os.path.join(year_dir, month)
+                for day in _subdirs(month_dir):
+                    shard = os.path.join(month_dir, day)
+                    if cutoff is not None and date(int(year), int(month), int(day)) < cutoff:
+                        shutil.rmtree(shard, ignore_errors=True)
+                    else:
+                        _remove_if_empty(shard)
+                _remove_if_empty(month_dir)
+            _remove_if_empty(year_dir)
+
+    def _shard_flat_files(self):
+        """
+        Move PDFs directly in the root into the shard of the date in their
+        name (diary_<class>_<YYYY_MM_DD>.pdf and friends)
+        """
+        moved = 0
+        for entry in os.scandir(self.root):
+            if not (entry.is_file() and entry.name.endswith('.pdf')):
+                continue
+            day = _date_in_name(entry.name)
+            if day is None:
+                continue
+            target = os.path.join(self.shard_dir(day), entry.name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(entry.path, target)
+            moved += 1
+        return moved
+
+
+def _subdirs(path):
+    """
+    Names of the all-digit subdirectories of path (shard levels), sorted;
+    this skips output/cache and any other non-shard directory
+    """
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return []
+    with entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.is_dir() and entry.name.isdigit()
+        )
+
+
+def _remove_if_empty(path):
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass  # not empty
+
+
+def _date_in_name(filename):
+    """
+    First YYYY_MM_DD date in a generated file name, or None
+    """
+    parts = filename[:-len('.pdf')].split('_')
+    for i in range(len(parts) - 2):
+        try:
+            return date(int(parts[i]), int(parts[i + 1]), int(parts[i + 2]))
+        except ValueError:
+            continue
+    return None
+
+
+def _guess_kind(relative):
+    name = relative.rsplit('/', 1)[-1]
+    if name.startswith('diaries_all_classes_'):
+        return 'combined'
+    if name.startswith('digest_'):
+        return 'digest'
+    return 'diary'
+
+
+_output_storages = {}
+
+
+def get_output_storage(root=OUTPUT_DIR):
+    """
+    Return the process-wide output storage for root
+    """
+    storage = _output_storages.get(root)
+    if storage is None:
+        storage = _output_storages[root] = OutputStorage(root, retention_from_env())
+    return storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the generated PDFs in the output directory")
+    parser.add_argument('-o', '--output-dir', default=OUTPUT_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    listing = commands.add_parser('list', help="List generated PDFs from the index")
+    listing.add_argument('--since')
+    listing.add_argument('--until')
+    listing.add_argument('--kind', choices=['diary', 'combined', 'digest'])
+    listing.add_argument('--class', dest='class_name')
+
+    prune = commands.add_parser('prune', help="Delete PDFs older than the retention period")
+    prune.add_argument('--retention-days', type=int,
+                       help="Days to keep (default: DIARY_OUTPUT_RETENTION_DAYS)")
+
+    commands.add_parser('compact', help="Shard flat files and resync the index with the tree")
+    args = parser.parse_args(argv)
+
+    storage = get_output_storage(args.output_dir)
+    if args.command == 'list':
+        files = storage.list(args.since, args.until, args.kind, args.class_name)
+        for entry in files:
+            print(f"{entry['date'].isoformat()}  {entry['kind']:<8} {entry['size'] / 1024:8.0f} KB  "
+                  f"{entry['path']}")
+        print(f"{len(files)} files")
+    elif args.command == 'prune':
+        days = args.retention_days or storage.retention_days
+        if not days:
+            print("No retention period given; nothing deleted")
+            return 1
+        print(f"{storage.prune(days)} files older than {days} days deleted")
+    else:
+        moved, dropped, added = storage.compact()
+        print(f"{moved} flat files sharded, {dropped} stale index entries dropped, "
+              f"{added} files indexed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.helpers import parse_diary_date
+
+
+DB_PATH = os.path.join('data', 'diaries.sqlite3')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS diaries (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    section TEXT NOT NULL DEFAULT '',
+    teacher TEXT NOT NULL DEFAULT '',
+    subjects TEXT NOT NULL,
+    additional_notes TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS diaries_date_class_section
+    ON diaries (date, class_name, section);
+CREATE INDEX IF NOT EXISTS diaries_class_date
+    ON diaries (class_name, date);
+"""
+
+
+class DiaryStore:
+    """
+    SQLite-backed store of diary_data records, one per (date, class, section)
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        # SQLite connections can't be shared between threads, so keep one
+        # per thread (Streamlit runs each session in its own thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def save(self, diary_data):
+        """
+        Insert or replace the diary for its date, class and section
+        """
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO diaries (date, class_name, section, teacher,
+                                     subjects, additional_notes, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (date, class_name, section) DO UPDATE SET
+                    teacher = excluded.teacher,
+                    subjects = excluded.subjects,
+                    additional_notes = excluded.additional_notes,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    diary_data['date'].isoformat(),
+                    str(diary_data['class']),
+                    (diary_data.get('section') or '').strip(),
+                    diary_data.get('teacher') or '',
+                    json.dumps(diary_data['subjects'], ensure_ascii=False),
+                    diary_data.get('additional_notes') or '',
+                    datetime.now().isoformat(timespec='seconds'),
+                ),
+            )
+
+    def load(self, diary_date, class_name, section=''):
+        """
+        Return the stored diary_data, or None if there is none
+        """
+        row = self._connection().execute(
+            "SELECT * FROM diaries WHERE date = ? AND class_name = ? AND section = ?",
+            (parse_diary_date(diary_date).isoformat(), str(class_name), (section or '').strip()),
+        ).fetchone()
+        return _row_to_diary_data(row) if row else None
+
+    def _select(self, columns, start=None, end=None, class_name=None, section=None):
+        query = f"SELECT {columns} FROM diaries WHERE 1 = 1"
+        params = []
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(parse_diary_date(start).isoformat())
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(parse_diary_date(end).isoformat())
+        if class_name is not None:
+            query += " AND class_name = ?"
+            params.append(str(class_name))
+        if section is not None:
+            query += " AND section = ?"
+            params.append(section.strip())
+        query += " ORDER BY date, CAST(class_name AS INTEGER), class_name, section"
+        return self._connection().execute(query, params)
+
+    def list(self, start=None, end=None, class_name=None, section=None):
+        """
+        List stored diaries (date, class, section, teacher, updated_at),
+        optionally limited to a date range, a class and a section
+        """
+        cursor = self._select(
+            "date, class_name, section, teacher, updated_at", start, end, class_name, section
+        )
+        return [
+            {
+                'date': parse_diary_date(row['date']),
+                'class': row['class_name'],
+                'section': row['section'],
+                'teacher': row['teacher'],
+                'updated_at': row['updated_at'],
+            }
+            for row in cursor
+        ]
+
+    def iter_diaries(self, start=None, end=None, class_name=None, section=None):
+        """
+        Yield full diary_data records one at a time, in date and class order
+        """
+        for row in self._select("*", start, end, class_name, section):
+            yield _row_to_diary_data(row)
+
+
+def _row_to_diary_data(row):
+    return {
+        'date': parse_diary_date(row['date']),
+        'class': row['class_name'],
+        'teacher': row['teacher'],
+        'section': row['section'],
+        'subjects': json.loads(row['subjects']),
+        'additional_notes': row['additional_notes'],
+    }
+
+
+_diary_store = None
+
+
+def get_diary_store():
+    """
+    Return the process-wide diary store
+    """
+    global _diary_store
+    if _diary_store is None:
+        _diary_store = DiaryStore()
+    return _diary_store
@@ -0,0 +1,299 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.units import inch
+from reportlab.platypus import TableStyle
+
+try:
+    import pytz
+except ImportError:
+    pytz = None
+
+
+# School name, colors, page layout and texts of the diary PDF. Other
+# templates only need the settings that differ from this one.
+DEFAULT_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'default.json'
+)
+
+
+class DiaryTheme:
+    """
+    Immutable styles, table styles and timezone shared by every diary render,
+    compiled from a template (see templates/default.json)
+    """
+
+    def __init__(self, template=None, digest=None):
+        if template is None:
+            template = read_template(DEFAULT_TEMPLATE_PATH)
+        self.template = template
+        self.digest = digest or template_digest(template)
+
+        styles = getSampleStyleSheet()
+        palette = {name: colors.HexColor(value) for name, value in template['colors'].items()}
+        self.colors = palette
+
+        # Header, footer and page layout
+        school = template['school']
+        self.school_name = school['name']
+        self.subtitle = school['subtitle']
+        self.footer_text = school['footer']
+        self.logo_paths = (template['logos']['left'], template['logos']['right'])
+        page = template['page']
+        self.margins = page['margins']
+        self.header_height = page['header_height']
+        self.logo_size = page['logo_size']
+
+        # Column widths are given in inches
+        columns = template['columns']
+        self.info_col_widths = [width * inch for width in columns['info']]
+        self.subjects_col_widths = [width * inch for width in columns['subjects']]
+        self.notes_col_widths = [width * inch for width in columns['notes']]
+
+        # Headings and labels
+        self.text = template['text']
+
+        self.title_style = ParagraphStyle(
+            'SchoolTitle',
+            parent=styles['Title'],
+            fontSize=22,
+            textColor=palette['title'],
+            alignment=TA_CENTER,
+            spaceAfter=8,
+            fontName='Helvetica-Bold',
+            letterSpacing=1
+        )
+
+        self.subtitle_style = ParagraphStyle(
+            'DiarySubtitle',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=palette['text'],
+            alignment=TA_CENTER,
+            spaceAfter=25,
+            fontName='Helvetica-Bold'
+        )
+
+        self.section_header_style = ParagraphStyle(
+            'SectionHeader',
+            parent=styles['Heading3'],
+            fontSize=14,
+            textColor=colors.white,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            backColor=palette['primary'],
+            borderPadding=8
+        )
+
+        # Paragraph styles for wrapped table cells
+        self.cell_style = ParagraphStyle(
+            'CellText',
+            parent=styles['Normal'],
+            fontName='Helvetica',
+            fontSize=10,
+            leading=13,
+            textColor=palette['text']
+        )
+
+        self.cell_bold_style = ParagraphStyle(
+            'CellTextBold',
+            parent=self.cell_style,
+            fontName='Helvetica-Bold'
+        )
+
+        # Entries of the table of contents in combined diaries
+        self.toc_entry_style = ParagraphStyle(
+            'TOCEntry',
+            parent=styles['Normal'],
+            fontName='Helvetica',
+            fontSize=12,
+            leading=22,
+            textColor=palette['text']
+        )
+
+        # Alternating colors of the subject rows
+        self.row_colors = [colors.white, palette['background']]
+
+        # Subject mapping for better display
+        self.subject_mapping = dict(template['subject_mapping'])
+
+        self.info_table_style = TableStyle([
+            # Header styling
+            ('BACKGROUND', (0, 0), (-1, -1), palette['background']),
+            ('TEXTCOLOR', (0, 0), (0, -1), palette['text']),
+            ('TEXTCOLOR', (2, 0), (2, -1), palette['text']),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTNAME', (3, 0), (3, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 1, palette['grid']),
+            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [palette['background']]),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+        ])
+
+        self.subjects_table_style = TableStyle([
+            # Header row styling
+            ('BACKGROUND', (0, 0), (-1, 0), palette['primary']),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+
+            # Data rows styling
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), palette['text']),
+            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),  # Subject names bold
+            ('FONTNAME', (1, 1), (1, -1), 'Helvetica'),       # Content normal
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+
+            # Grid and borders
+            ('GRID', (0, 0), (-1, -1), 1, palette['grid']),
+            ('LINEBELOW', (0, 0), (-1, 0), 2, palette['primary']),
+
+            # Padding
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+
+            # Alternating row colors
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), self.row_colors)
+        ])
+
+        self.notes_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), palette['notes']),
+            ('BACKGROUND', (1, 0), (1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.white),
+            ('TEXTCOLOR', (1, 0), (1, -1), palette['text']),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('GRID', (0, 0), (-1, -1), 1, palette['grid']),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('LEFTPADDING', (0, 0), (-1, -1), 12),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+        ])
+
+        # Timezone for the "Created on" footer (None falls back to local time)
+        self.timezone = pytz.timezone(template['timezone']) if pytz and template.get('timezone') else None
+
+        self._rtl_cell_styles = {}
+
+    def rtl_cell_style(self, font_name):
+        """
+        Right-aligned cell style for shaped Urdu/Arabic text in font_name
+        """
+        style = self._rtl_cell_styles.get(font_name)
+        if style is None:
+            style = self._rtl_cell_styles[font_name] = ParagraphStyle(
+                f'CellTextRTL-{font_name}',
+                parent=self.cell_style,
+                fontName=font_name,
+                leading=16,
+                alignment=TA_RIGHT
+            )
+        return style
+
+
+def merge_template(base, overrides):
+    """
+    Copy of base with overrides applied; nested settings are merged key by key
+    """
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_template(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def template_digest(template):
+    """
+    Content hash of a (merged) template
+    """
+    encoded = json.dumps(template, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def parse_template(path, content):
+    """
+    Parse template file content: YAML for .yaml/.yml files (needs PyYAML),
+    JSON otherwise
+    """
+    if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"PyYAML is required to read the template {path}")
+        template = yaml.safe_load(content)
+    else:
+        template = json.loads(content)
+    if not isinstance(template, dict):
+        raise ValueError(f"Template {path} must contain a mapping of settings")
+    return template
+
+
+def read_template(path):
+    """
+    Read a template file and fill in the settings it leaves out from the
+    default template
+    """
+    with open(path, 'rb') as f:
+        template = parse_template(path, f.read())
+    if os.path.abspath(path) == DEFAULT_TEMPLATE_PATH:
+        return template
+    return merge_template(read_template(DEFAULT_TEMPLATE_PATH), template)
+
+
+# Compiled themes by template digest, and path -> (mtime, size, digest) so
+# unchanged files are neither re-read nor re-compiled
+_themes = {}
+_template_files = {}
+_theme_lock = threading.Lock()
+
+
+def get_theme(template=None):
+    """
+    Return the compiled theme of a template file (DIARY_TEMPLATE or
+    templates/default.json when not given). Templates are compiled once per
+    content hash; later calls only check the file's modification time.
+    """
+    path = template or os.environ.get('DIARY_TEMPLATE') or DEFAULT_TEMPLATE_PATH
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    known = _template_files.get(path)
+    if known is not None and known[:2] == version:
+        return _themes[known[2]]
+
+    with _theme_lock:
+        known = _template_files.get(path)
+        if known is not None and known[:2] == version:
+            return _themes[known[2]]
+
+        merged = read_template(path)
+        digest = template_digest(merged)
+        if digest not in _themes:
+            _themes[digest] = DiaryTheme(merged, digest)
+        _template_files[path] = version + (digest,)
+        return _themes[digest]